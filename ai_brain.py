@@ -1,12 +1,22 @@
 import json
+import itertools
+import re
 import os
 import base64
 import io
 from PIL import Image
-from config import GEMINI_API_KEY
+from config import (
+    GEMINI_API_KEY,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_DISK_MB,
+    RESULT_CACHE_ENTRIES,
+    RESULT_CACHE_TTL,
+)
 
 import google.generativeai as genai
-import time
+from model_fallback import ModelFallbackEngine, ModelsExhausted, RequestRejected
+from model_registry import ModelRegistry
+from result_cache import ResultCache
 
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
@@ -40,6 +50,21 @@ MODEL_IDS = [
     'gemini-2.5-flash-lite'
 ]
 
+# Shared across every entry point so model health is learned once per process
+fallback_engine = ModelFallbackEngine(MODEL_IDS, label="AI Brain")
+
+# Bump when an analysis prompt or its output schema changes so cached results are not reused
+PROMPT_VERSION = "1"
+
+# Content-addressed cache for report/image/license analysis results
+result_cache = ResultCache(
+    "analysis",
+    max_entries=RESULT_CACHE_ENTRIES,
+    ttl=RESULT_CACHE_TTL,
+    disk_dir=RESULT_CACHE_DIR or None,
+    max_disk_bytes=RESULT_CACHE_DISK_MB * 1024 * 1024,
+)
+
 # Clinical safety settings to avoid over-blocking
 SAFETY_SETTINGS = [
     {
@@ -60,34 +85,44 @@ SAFETY_SETTINGS = [
     },
 ]
 
+# Generation config for endpoints that must answer with JSON
+JSON_OUTPUT = {"response_mime_type": "application/json"}
+
+# One GenerativeModel per (model, safety settings, generation config), reused by every request
+model_registry = ModelRegistry()
+
+def _model(model_id: str, generation_config: dict = None):
+    return model_registry.get(model_id, safety_settings=SAFETY_SETTINGS, generation_config=generation_config)
+
+def warm_up(network: bool = False):
+    """Pre-build every model variant ai_brain uses (called from the server lifespan)."""
+    variants = []
+    for base_id in MODEL_IDS:
+        variants += [base_id, f"models/{base_id}"]
+    model_registry.warm_up(variants, SAFETY_SETTINGS, (None, JSON_OUTPUT), network=network)
+
+def _history_context(history: list) -> str:
+    if not history:
+        return ""
+    return "\nPATIENT HISTORY:\n" + "\n".join([f"- {h.get('diagnosis', 'Consultation')}: {h.get('created_at', '')}" for h in history])
+
 def process_command(user_text: str, history: list = None, use_online: bool = True) -> dict:
-    history_context = ""
-    if history:
-        history_context = "\nPATIENT HISTORY:\n" + "\n".join([f"- {h.get('diagnosis', 'Consultation')}: {h.get('created_at', '')}" for h in history])
+    history_context = _history_context(history)
     
     prompt = f"{SYSTEM_PROMPT}\n{history_context}\n\nUser: {user_text}"
     
-    last_error = "Unknown error"
-    for model_id in MODEL_IDS:
-        for attempt in range(2):
-            try:
-                model = genai.GenerativeModel(model_id, safety_settings=SAFETY_SETTINGS)
-                result = model.generate_content(prompt)
-                print(f"[AI Brain] Success with {model_id}")
-                return _clean_json(result.text)
-            except Exception as e:
-                last_error = str(e)
-                error_msg = last_error.lower()
-                print(f"[AI Brain] {model_id} failed (Attempt {attempt+1}): {error_msg[:100]}")
-                
-                if "429" in error_msg or "quota" in error_msg:
-                    if attempt == 0:
-                        print(f"[AI Brain] Rate limited on {model_id}. Retrying after 2s...")
-                        time.sleep(2)
-                        continue
-                break # Next model
-            
-    # Final fallback message with real error
+    def generate(model_id):
+        model = _model(model_id)
+        return model.generate_content(prompt).text
+
+    try:
+        text, _ = fallback_engine.call(generate, label="Chat")
+        return _clean_json(text)
+    except ModelsExhausted as e:
+        return exhausted_reply(e.last_error)
+
+def exhausted_reply(last_error: str) -> dict:
+    """Final fallback message with real error (chat answer when no model could respond)."""
     return {
         "response": f"AI Error: {last_error}",
         "action": "none",
@@ -95,6 +130,151 @@ def process_command(user_text: str, history: list = None, use_online: bool = Tru
         "error_type": "exhausted_all_models"
     }
 
+def stream_command(user_text: str, history: list = None):
+    """
+    Streaming variant of process_command: yields raw text chunks of the
+    model's JSON reply as Gemini produces them (feed them to
+    ResponseStreamParser). Model fallback only applies until the first
+    chunk arrives; an error mid-stream is raised to the caller.
+    """
+    prompt = f"{SYSTEM_PROMPT}\n{_history_context(history)}\n\nUser: {user_text}"
+
+    def open_stream(model_id):
+        model = _model(model_id)
+        chunks = iter(model.generate_content(prompt, stream=True))
+        # Pull the first chunk here so 404/429 surface inside the fallback engine
+        return next(chunks), chunks
+
+    (first, chunks), _ = fallback_engine.call(open_stream, label="Chat stream")
+    for chunk in itertools.chain([first], chunks):
+        try:
+            text = chunk.text
+        except ValueError:
+            continue  # chunk without text parts (e.g. final finish_reason chunk)
+        if text:
+            yield text
+
+class ResponseStreamParser:
+    """
+    Incremental parser for a streamed process_command JSON reply.
+    feed() returns the newly decoded part of the top-level "response" string
+    as soon as it arrives; finish() parses the complete reply (markers,
+    urgency, ...) exactly like process_command does.
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str = "response"):
+        self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = None
+        self.text_complete = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self.text_complete:
+            return ""
+        if self._pos is None:
+            match = self._pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        buf = self._buffer
+        i = self._pos
+        out = []
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.text_complete = True
+                i += 1
+                break
+            if ch != '\\':
+                out.append(ch)
+                i += 1
+                continue
+            # Escape sequence - wait for more input if it is split across chunks
+            if i + 1 >= len(buf):
+                break
+            esc = buf[i + 1]
+            if esc != 'u':
+                out.append(self._ESCAPES.get(esc, esc))
+                i += 2
+                continue
+            if i + 6 > len(buf):
+                break
+            code = int(buf[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                if i + 12 > len(buf):
+                    break
+                if buf[i + 6:i + 8] == '\\u':
+                    low = int(buf[i + 8:i + 12], 16)
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+            out.append(chr(code))
+            i += 6
+        self._pos = i
+        return "".join(out)
+
+    def finish(self) -> dict:
+        return _clean_json(self._buffer)
+
+def process_command_batch(items: list) -> list:
+    """
+    Answer several independent chat messages with one Gemini call.
+    `items` is a list of (user_text, history) tuples; returns one parsed dict
+    per item in the same order, or None if the model's reply could not be
+    split back into exactly len(items) answers (callers then fall back to
+    process_command per item). Every answer must name its conversation
+    number, so a reordered or merged reply is rejected, never misassigned.
+    Raises ModelsExhausted when no model answered at all.
+    """
+    sections = []
+    for i, (user_text, history) in enumerate(items, start=1):
+        sections.append(f"### CONVERSATION {i}{_history_context(history)}\n\nUser: {user_text}")
+    conversations = "\n\n".join(sections)
+
+    prompt = f"""{SYSTEM_PROMPT}
+BATCH MODE:
+You will receive {len(items)} INDEPENDENT conversations from different patients.
+Answer each one on its own - never mix information between conversations.
+Return a JSON ARRAY with exactly {len(items)} objects, one per conversation,
+each object following the OUTPUT JSON FORMAT above plus an integer field
+"conversation" holding its conversation number (1 to {len(items)}).
+
+{conversations}
+"""
+
+    def generate(model_id):
+        return _model(model_id, JSON_OUTPUT).generate_content(prompt).text
+
+    try:
+        text, _ = fallback_engine.call(generate, label=f"Chat batch x{len(items)}")
+    except RequestRejected:
+        # One message may be the culprit; answering individually isolates it
+        return None
+
+    try:
+        answers = json.loads(text)
+    except ValueError:
+        return None
+    by_number = {}
+    if isinstance(answers, list):
+        for answer in answers:
+            number = answer.get("conversation") if isinstance(answer, dict) else None
+            if isinstance(number, int) and not isinstance(number, bool) and number not in by_number:
+                by_number[number] = answer
+    if not isinstance(answers, list) or len(answers) != len(items) or sorted(by_number) != list(range(1, len(items) + 1)):
+        print(f"[AI Brain] Batch reply did not split into {len(items)} numbered answers", flush=True)
+        return None
+    results = []
+    for number in range(1, len(items) + 1):
+        answer = dict(by_number[number])
+        answer.pop("conversation")
+        results.append(_clean_json(json.dumps(answer)))
+    return results
+
 def _get_mime_type(data: bytes) -> str:
     """Detect MIME type from header bytes."""
     if data.startswith(b'%PDF'):
@@ -110,34 +290,57 @@ def _get_mime_type(data: bytes) -> str:
     # Fallback to image/jpeg for Gemini
     return "image/jpeg"
 
+def _get_audio_mime_type(data: bytes, fallback: str = "audio/webm") -> str:
+    """Detect audio container from header bytes (MediaRecorder, mobile recorders, uploads)."""
+    if data.startswith(b'\x1a\x45\xdf\xa3'):
+        # EBML header: WebM (Chrome/Firefox MediaRecorder) or plain Matroska
+        return "audio/webm" if b'webm' in data[:64] else "audio/x-matroska"
+    if data.startswith(b'OggS'):
+        return "audio/ogg"
+    if data.startswith(b'RIFF') and data[8:12] == b'WAVE':
+        return "audio/wav"
+    if data.startswith(b'fLaC'):
+        return "audio/flac"
+    if data.startswith(b'FORM') and data[8:12] in (b'AIFF', b'AIFC'):
+        return "audio/aiff"
+    if data[4:8] == b'ftyp':
+        # ISO BMFF: Safari/iOS MediaRecorder and .m4a voice memos
+        return "audio/mp4"
+    if data.startswith(b'ID3'):
+        return "audio/mp3"
+    if len(data) > 1 and data[0] == 0xFF and (data[1] & 0xF6) == 0xF0:
+        return "audio/aac"  # ADTS frame sync, layer bits 00
+    if len(data) > 1 and data[0] == 0xFF and (data[1] & 0xE0) == 0xE0:
+        return "audio/mp3"  # MPEG audio frame sync
+    return fallback
+
+def _analysis_cache_key(kind: str, prompt: str, data: bytes) -> str:
+    """Key = uploaded bytes + prompt (and its version) + the model list that may answer."""
+    return ResultCache.make_key(kind, PROMPT_VERSION, ",".join(MODEL_IDS), prompt, data)
+
 def analyze_image(image_bytes, prompt="Analyze this medical image.", use_online: bool = True):
     print(f"[AI Brain] Analyzing Content with prompt: {prompt[:50]}...")
-    last_error = "Unknown"
-    for base_id in MODEL_IDS:
-        # Check both the direct ID and the models/ prefix
-        for model_id in [f"models/{base_id}" if not base_id.startswith('models/') else base_id, base_id]:
-            for attempt in range(2):
-                try:
-                    model = genai.GenerativeModel(model_id, safety_settings=SAFETY_SETTINGS)
-                    
-                    # Direct bytes-to-Gemini (Bypasses PIL identification issues)
-                    mime_type = _get_mime_type(image_bytes)
-                    content = [{"mime_type": mime_type, "data": image_bytes}, prompt]
-
-                    response = model.generate_content(content)
-                    print(f"[AI Brain] Content Success with {model_id}")
-                    return {"response": response.text, "source": f"Gemini {model_id}"}
-                except Exception as e:
-                    last_error = str(e)
-                    error_msg = last_error.lower()
-                    print(f"[AI Brain] Analysis for {model_id} failed (Attempt {attempt+1}): {error_msg[:100]}")
-                    if "429" in error_msg or "quota" in error_msg:
-                        if attempt == 0:
-                            time.sleep(2)
-                            continue
-                    break # Next model
-            
-    return {"response": f"Content analysis unavailable: {last_error}", "source": "Error"}
+    cache_key = _analysis_cache_key("image", prompt, image_bytes)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print("[AI Brain] Content served from cache")
+        return dict(cached)
+
+    # Direct bytes-to-Gemini (Bypasses PIL identification issues)
+    mime_type = _get_mime_type(image_bytes)
+    content = [{"mime_type": mime_type, "data": image_bytes}, prompt]
+
+    def generate(model_id):
+        model = _model(model_id)
+        return model.generate_content(content).text
+
+    try:
+        text, model_id = fallback_engine.call(generate, label="Content")
+        result = {"response": text, "source": f"Gemini {model_id}"}
+        result_cache.set(cache_key, result)
+        return result
+    except ModelsExhausted as e:
+        return {"response": f"Content analysis unavailable: {e.last_error}", "source": "Error"}
 
 def analyze_license(image_bytes):
     prompt_text = """Analyze this medical license or hospital registration document.
@@ -174,26 +377,34 @@ def analyze_license(image_bytes):
             "reasoning": "Mock verification for system testing."
          }
 
-    # Try preferred models in order with retries for free tier
-    last_error = "Unknown"
-    for base_id in MODEL_IDS:
-        for model_id in [f"models/{base_id}", base_id]:
-            for attempt in range(2):
-                try:
-                    model = genai.GenerativeModel(model_id, safety_settings=SAFETY_SETTINGS)
-                    img = Image.open(io.BytesIO(image_bytes))
-                    response = model.generate_content([prompt_text, img])
-                    print(f"[AI Brain] License Success with {model_id}", flush=True)
-                    return _clean_json(result_text=response.text)
-                except Exception as e:
-                    last_error = str(e)
-                    error_msg = last_error.lower()
-                    print(f"[AI Brain] License analysis for {model_id} failed (Attempt {attempt+1}): {error_msg[:100]}", flush=True)
-                    if "429" in error_msg or "quota" in error_msg:
-                        if attempt == 0:
-                            time.sleep(2)
-                            continue
-                    break # Next model variant
+    cache_key = _analysis_cache_key("license", prompt_text, image_bytes)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print("[AI Brain] License served from cache", flush=True)
+        return dict(cached)
+
+    # Preferred models in order, skipping ones whose breaker is open
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+    except Exception as e:
+        img = None
+        last_error = f"Unreadable image: {e}"
+
+    def generate(model_id):
+        model = _model(model_id)
+        return model.generate_content([prompt_text, img]).text
+
+    if img is not None:
+        try:
+            text, _ = fallback_engine.call(generate, label="License")
+            result = _parse_json(text)
+            if result is None:
+                # Not JSON: show it once, but never cache a malformed reply
+                return _clean_json(result_text=text)
+            result_cache.set(cache_key, result)
+            return result
+        except ModelsExhausted as e:
+            last_error = e.last_error
  
     return {
         "is_valid": False, 
@@ -239,35 +450,19 @@ def analyze_clinical_request(request_text: str, history: list, image_bytes=None)
     }}
     """
     
-    last_error = "Unknown"
-    # Try preferred models with prefix priority
-    for base_id in MODEL_IDS:
-        for model_id in [f"models/{base_id}" if not base_id.startswith('models/') else base_id, base_id]:
-            for attempt in range(2):
-                try:
-                    model = genai.GenerativeModel(model_id, safety_settings=SAFETY_SETTINGS)
-                    items = [prompt]
-                    if image_bytes:
-                        mime_type = _get_mime_type(image_bytes)
-                        items.append({"mime_type": mime_type, "data": image_bytes})
-                    
-                    response = model.generate_content(
-                        items,
-                        generation_config=genai.types.GenerationConfig(
-                            response_mime_type="application/json"
-                        )
-                    )
-                    print(f"[AI Brain] Clinical Success with {model_id}", flush=True)
-                    return _clean_json(result_text=response.text)
-                except Exception as e:
-                    last_error = str(e)
-                    error_msg = last_error.lower()
-                    print(f"[AI Brain] Clinical analysis for {model_id} failed (Attempt {attempt+1}): {error_msg[:100]}", flush=True)
-                    if "429" in error_msg or "quota" in error_msg:
-                        if attempt == 0:
-                            time.sleep(2)
-                            continue
-                    break # Next model or variant
+    items = [prompt]
+    if image_bytes:
+        mime_type = _get_mime_type(image_bytes)
+        items.append({"mime_type": mime_type, "data": image_bytes})
+
+    def generate(model_id):
+        return _model(model_id, JSON_OUTPUT).generate_content(items).text
+
+    try:
+        text, _ = fallback_engine.call(generate, label="Clinical")
+        return _clean_json(result_text=text)
+    except ModelsExhausted as e:
+        last_error = e.last_error
                 
     return {
         "conclusion": f"Clinical Analysis Failed: {last_error}",
@@ -305,28 +500,30 @@ def analyze_medical_report(image_bytes: bytes) -> dict:
     }}
     """
     
-    last_error = "Unknown"
-    for base_id in MODEL_IDS:
-        for model_id in [f"models/{base_id}" if not base_id.startswith('models/') else base_id, base_id]:
-            for attempt in range(2):
-                try:
-                    model = genai.GenerativeModel(model_id, safety_settings=SAFETY_SETTINGS)
-                    
-                    # Direct bytes-to-Gemini
-                    mime_type = _get_mime_type(image_bytes)
-                    data_part = {"mime_type": mime_type, "data": image_bytes}
-                    response = model.generate_content([prompt, data_part])
-                        
-                    print(f"[AI Brain] Report Analysis Success with {model_id}", flush=True)
-                    return _clean_json(result_text=response.text)
-                except Exception as e:
-                    last_error = str(e)
-                    print(f"[AI Brain] Report analysis for {model_id} failed: {last_error[:100]}", flush=True)
-                    if "429" in last_error or "quota" in last_error:
-                        if attempt == 0:
-                            time.sleep(2)
-                            continue
-                    break
+    cache_key = _analysis_cache_key("report", prompt, image_bytes)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print("[AI Brain] Report served from cache", flush=True)
+        return dict(cached)
+
+    # Direct bytes-to-Gemini
+    mime_type = _get_mime_type(image_bytes)
+    data_part = {"mime_type": mime_type, "data": image_bytes}
+
+    def generate(model_id):
+        model = _model(model_id)
+        return model.generate_content([prompt, data_part]).text
+
+    try:
+        text, _ = fallback_engine.call(generate, label="Report Analysis")
+        result = _parse_json(text)
+        if result is None:
+            # Not JSON: show it once, but never cache a malformed reply
+            return _clean_json(result_text=text)
+        result_cache.set(cache_key, result)
+        return result
+    except ModelsExhausted as e:
+        last_error = e.last_error
                     
     return {
         "title": "Analysis Failed",
@@ -336,28 +533,58 @@ def analyze_medical_report(image_bytes: bytes) -> dict:
         "error": "analysis_failed"
     }
 
-def _clean_json(text=None, result_text=None):
-    # Support both argument names for backward compatibility or clarity
-    raw = result_text if result_text else text
-    if not raw: return {}
-    
+TRANSCRIBE_PROMPT = "Transcribe this audio exactly as heard. Do not add any commentary or prefix. Return only the transcribed text."
+
+def transcribe_audio(audio_bytes: bytes, declared_mime: str = None) -> str:
+    """
+    Transcribe an in-memory audio clip with Gemini (no temp files).
+    The container is sniffed from the header; `declared_mime` (the upload's
+    Content-Type) is only used when the header is not recognized.
+    Raises ModelsExhausted if no model could transcribe it.
+    """
+    fallback = declared_mime if declared_mime and declared_mime.startswith("audio/") else "audio/webm"
+    audio_part = {"mime_type": _get_audio_mime_type(audio_bytes, fallback), "data": audio_bytes}
+
+    def generate(model_id):
+        return _model(model_id).generate_content([TRANSCRIBE_PROMPT, audio_part]).text
+
+    text, _ = fallback_engine.call(generate, label=f"Transcription ({audio_part['mime_type']})")
+    return text.strip()
+
+def _strip_fences(raw: str) -> str:
     raw = raw.strip()
     if raw.startswith('```json'):
         raw = raw.replace('```json', '').replace('```', '')
     elif raw.startswith('```'):
         raw = raw.replace('```', '')
+    return raw
+
+def _parse_json(raw: str):
+    """The model reply as a JSON object with the Clinical Context fields, or None if it is not one."""
     try:
-        data = json.loads(raw)
-        # Ensure minimum required fields for Clinical Context
-        if "markers" not in data: data["markers"] = []
-        if "conclusion" not in data: data["conclusion"] = data.get("response", "Analysis complete.")
+        data = json.loads(_strip_fences(raw or ""))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    # Ensure minimum required fields for Clinical Context
+    if "markers" not in data: data["markers"] = []
+    if "conclusion" not in data: data["conclusion"] = data.get("response", "Analysis complete.")
+    return data
+
+def _clean_json(text=None, result_text=None):
+    # Support both argument names for backward compatibility or clarity
+    raw = result_text if result_text else text
+    if not raw: return {}
+    
+    data = _parse_json(raw)
+    if data is not None:
         return data
-    except:
-        # If valid JSON parsing fails, assume the AI returned just the text conclusion
-        # This prevents "JSON_PARSE_ERROR" from hiding a valid text response
-        return {
-            "conclusion": raw,
-            "markers": [],
-            "error": None
-        }
+    # If valid JSON parsing fails, assume the AI returned just the text conclusion
+    # This prevents "JSON_PARSE_ERROR" from hiding a valid text response
+    return {
+        "conclusion": _strip_fences(raw),
+        "markers": [],
+        "error": None
+    }
 
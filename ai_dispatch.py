@@ -0,0 +1,190 @@
+"""AI Dispatch - Bounded worker pool for the blocking ai_brain calls.
+
+The Gemini SDK calls in ai_brain are synchronous (network round-trips plus
+retry backoff), so running them directly inside an `async def` endpoint
+freezes the uvicorn event loop. Every AI endpoint goes through `run()`
+instead, which executes the call on a shared thread pool while each
+endpoint "lane" is capped by its own semaphore. A burst of report analyses
+can then only occupy the report lane, and health checks / pharmacy scans
+keep being served from the event loop.
+
+Usage:
+    response = await ai_dispatch.run("report", ai_brain.analyze_medical_report, contents)
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import AI_LANE_LIMITS, AI_QUEUE_TIMEOUT, AI_WORKER_THREADS
+
+# Lane used when a caller passes a name that has no configured limit
+DEFAULT_LANE_LIMIT = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+_lanes = {}
+_END = object()
+
+
+class DispatchBusy(Exception):
+    """Raised when a lane stays saturated for longer than AI_QUEUE_TIMEOUT."""
+
+
+class _Lane:
+    """Concurrency gate and counters for one endpoint family."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Create the shared worker pool on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = AI_WORKER_THREADS or sum(AI_LANE_LIMITS.values()) or DEFAULT_LANE_LIMIT
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-worker")
+                print(f"[AI Dispatch] Worker pool started with {workers} threads")
+    return _executor
+
+
+def _get_lane(name: str) -> _Lane:
+    lane = _lanes.get(name)
+    if lane is None:
+        lane = _Lane(name, AI_LANE_LIMITS.get(name, DEFAULT_LANE_LIMIT))
+        _lanes[name] = lane
+    return lane
+
+
+async def _acquire(lane: _Lane):
+    """Wait for a slot in `lane`; DispatchBusy after AI_QUEUE_TIMEOUT seconds."""
+    lane.waiting += 1
+    try:
+        await asyncio.wait_for(lane.semaphore.acquire(), timeout=AI_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        lane.rejected += 1
+        raise DispatchBusy(f"AI lane '{lane.name}' is saturated ({lane.limit} in flight)")
+    finally:
+        lane.waiting -= 1
+    lane.in_flight += 1
+
+
+def _release(lane: _Lane):
+    lane.in_flight -= 1
+    lane.completed += 1
+    lane.semaphore.release()
+
+
+def _submit(lane: _Lane, loop, call):
+    """
+    Start `call` on the worker pool; the lane slot is released when the
+    worker finishes (or the job is cancelled before it starts), not when
+    the awaiting coroutine goes away, so lane limits bound real work.
+    """
+    try:
+        future = _get_executor().submit(call)
+    except BaseException:
+        _release(lane)
+        raise
+
+    def done(_):
+        try:
+            loop.call_soon_threadsafe(_release, lane)
+        except RuntimeError:
+            pass  # event loop closed under us
+
+    future.add_done_callback(done)
+    return future
+
+
+async def run(lane_name: str, func, *args, **kwargs):
+    """
+    Run a blocking ai_brain function off the event loop.
+    Waits for a free slot in `lane_name` and raises DispatchBusy if none
+    frees up within AI_QUEUE_TIMEOUT seconds. If the caller is cancelled
+    the call keeps its slot until the worker thread is done with it.
+    """
+    lane = _get_lane(lane_name)
+    await _acquire(lane)
+    loop = asyncio.get_running_loop()
+    future = _submit(lane, loop, functools.partial(func, *args, **kwargs))
+    return await asyncio.wrap_future(future, loop=loop)
+
+
+async def stream(lane_name: str, gen_func, *args, **kwargs):
+    """
+    Async-iterate a blocking generator (e.g. ai_brain.stream_command).
+    The generator runs on a worker thread and hands items to the event loop
+    through a queue; the lane slot is held until the generator thread
+    exits (after the stream ends, or at the next item once the consumer
+    stops iterating).
+    """
+    lane = _get_lane(lane_name)
+    await _acquire(lane)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def hand_off(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            stopped.set()  # event loop closed under us
+
+    def produce():
+        try:
+            for item in gen_func(*args, **kwargs):
+                if stopped.is_set():
+                    break
+                hand_off(item)
+        except Exception as e:
+            hand_off(_END, e)
+        else:
+            hand_off(_END)
+
+    future = _submit(lane, loop, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+        future.cancel()  # only takes effect if produce never started
+
+
+def stats() -> dict:
+    """Per-lane concurrency counters (exposed on /api/health)."""
+    return {name: lane.stats() for name, lane in _lanes.items()}
+
+
+def shutdown():
+    """Stop the worker pool (called from the server lifespan hook)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+__all__ = ["run", "stream", "stats", "shutdown", "DispatchBusy"]
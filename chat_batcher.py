@@ -0,0 +1,111 @@
+"""Chat Batcher - Opt-in micro-batching for /api/chat bursts.
+
+During triage rushes many short chat messages arrive within the same
+second, each paying a full Gemini round-trip for the same SYSTEM_PROMPT.
+When CHAT_BATCH_ENABLED is set, requests arriving within
+CHAT_BATCH_WINDOW_MS of each other (up to CHAT_BATCH_MAX) are coalesced
+into one ai_brain.process_command_batch call, and every caller still gets
+its own parsed JSON answer.
+
+If the model's batched reply cannot be split back into one answer per
+request, each request is re-run individually, so batching can only save
+upstream calls - never lose an answer. If no model is available at all,
+every request in the batch gets the exhausted-models reply at once
+instead of N more calls into the same exhausted pool.
+
+Note: batched prompts put several patients' messages into one upstream
+request. Keep this disabled where that is not acceptable.
+"""
+import asyncio
+from collections import Counter
+
+import ai_brain
+import ai_dispatch
+from model_fallback import ModelsExhausted
+
+
+class ChatBatcher:
+    """Collects concurrent chat requests and flushes them as one upstream call."""
+
+    def __init__(self, window_ms: float = 50, max_batch: int = 8):
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        # Metrics
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.upstream_calls = 0
+        self.fallbacks = 0
+
+    async def submit(self, user_text: str, history: list = None) -> dict:
+        """Queue one chat message and wait for its answer."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((user_text, history or [], future))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list):
+        self.batch_sizes[len(batch)] += 1
+        try:
+            if len(batch) == 1:
+                results = [await self._single(batch[0])]
+            else:
+                self.upstream_calls += 1
+                items = [(text, history) for text, history, _ in batch]
+                try:
+                    results = await ai_dispatch.run("chat", ai_brain.process_command_batch, items)
+                except ModelsExhausted as e:
+                    print(f"[Chat Batcher] Batch of {len(batch)} failed, no model available")
+                    results = [ai_brain.exhausted_reply(e.last_error) for _ in batch]
+                if results is None:
+                    self.fallbacks += 1
+                    print(f"[Chat Batcher] Batch of {len(batch)} fell back to single requests")
+                    results = await asyncio.gather(*(self._single(entry) for entry in batch))
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _single(self, entry):
+        text, history, _ = entry
+        self.upstream_calls += 1
+        return await ai_dispatch.run("chat", ai_brain.process_command, text, history)
+
+    def stats(self) -> dict:
+        batches = sum(self.batch_sizes.values())
+        batched_requests = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "requests": self.requests,
+            "batches": batches,
+            "upstream_calls": self.upstream_calls,
+            "fallbacks": self.fallbacks,
+            "avg_batch_size": round(batched_requests / batches, 2) if batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
+
+
+__all__ = ["ChatBatcher"]
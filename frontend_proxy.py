@@ -0,0 +1,154 @@
+"""Frontend Proxy - Streaming pass-through from FastAPI to the Vite server.
+
+Responses are relayed chunk by chunk (`http_client.send(stream=True)`)
+instead of being buffered with `resp.content`, so serving the multi-MB
+humanoid .glb models costs a constant amount of memory per connection and
+the browser starts receiving bytes immediately.
+
+Conditional and partial requests pass straight through: If-None-Match /
+If-Modified-Since / Range go to Vite and ETag, Last-Modified,
+Content-Range and Accept-Ranges come back, so 304 revalidation and ranged
+downloads work as if Vite were hit directly.
+
+Optionally, content-hashed build assets (immutable by name) are kept in a
+local directory and served from disk without touching Vite at all.
+"""
+import asyncio
+import os
+import re
+import uuid
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from config import FRONTEND_ASSET_CACHE_DIR, FRONTEND_IMMUTABLE_PATTERN
+
+# Never forwarded in either direction (RFC 9110 hop-by-hop + ones we rewrite)
+_HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+# Host is set by httpx; accept-encoding is dropped so Vite answers with identity bodies
+_SKIP_REQUEST_HEADERS = _HOP_BY_HOP | {"host", "accept-encoding"}
+_PASS_RESPONSE_HEADERS = {
+    "content-type", "content-length", "content-encoding", "content-range", "accept-ranges",
+    "etag", "last-modified", "cache-control", "expires", "vary",
+}
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Bytes of a cached asset gathered before one off-loop disk write
+_TEE_WRITE_BYTES = 1024 * 1024
+
+_immutable_re = re.compile(FRONTEND_IMMUTABLE_PATTERN) if FRONTEND_IMMUTABLE_PATTERN else None
+_cache_dir = Path(FRONTEND_ASSET_CACHE_DIR) if FRONTEND_ASSET_CACHE_DIR else None
+if _cache_dir:
+    _cache_dir.mkdir(parents=True, exist_ok=True)
+
+
+def _is_immutable(path: str) -> bool:
+    return bool(_cache_dir and _immutable_re and _immutable_re.match(path.lstrip("/")))
+
+
+def _cache_path(path: str) -> Path:
+    # Flatten to a single directory; hashed names are already unique
+    return _cache_dir / path.lstrip("/").replace("/", "__")
+
+
+def _not_modified(request, etag: str, mtime: float) -> bool:
+    """RFC 9110 revalidation: If-None-Match wins; If-Modified-Since only when it is absent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _serve_cached(request, cached: Path) -> Response:
+    """Serve an immutable asset from disk (304 when the validators match, Range via FileResponse)."""
+    stat = cached.stat()
+    response = FileResponse(cached, stat_result=stat, headers={"cache-control": _IMMUTABLE_CACHE_CONTROL})
+    if _not_modified(request, response.headers["etag"], stat.st_mtime):
+        return Response(status_code=304, headers={
+            "cache-control": _IMMUTABLE_CACHE_CONTROL,
+            "etag": response.headers["etag"],
+            "last-modified": response.headers["last-modified"],
+        })
+    return response
+
+
+def _finish_cache_file(f, tmp: Path, destination: Path, complete: bool):
+    f.close()
+    if complete:
+        os.replace(tmp, destination)
+    else:
+        tmp.unlink(missing_ok=True)
+
+
+async def _tee_to_cache(chunks, destination: Path):
+    """
+    Relay chunks to the client while writing them to a temp file; keep it
+    only if complete. Disk I/O runs on worker threads, in writes of up to
+    _TEE_WRITE_BYTES, so the event loop never waits on the disk.
+    """
+    tmp = destination.with_name(f"{destination.name}.{uuid.uuid4().hex}.tmp")
+    f = await asyncio.to_thread(open, tmp, "wb")
+    pending, pending_bytes = [], 0
+    complete = False
+    try:
+        async for chunk in chunks:
+            yield chunk
+            pending.append(chunk)
+            pending_bytes += len(chunk)
+            if pending_bytes >= _TEE_WRITE_BYTES:
+                await asyncio.to_thread(f.write, b"".join(pending))
+                pending, pending_bytes = [], 0
+        if pending:
+            await asyncio.to_thread(f.write, b"".join(pending))
+        complete = True
+    finally:
+        await asyncio.to_thread(_finish_cache_file, f, tmp, destination, complete)
+
+
+async def forward(client, request, target_path: str) -> Response:
+    """
+    Stream `request` to the upstream `client` and relay the response.
+    Raises the httpx error if the upstream cannot be reached.
+    """
+    path_only = target_path.split("?", 1)[0]
+    immutable = request.method == "GET" and _is_immutable(path_only)
+    if immutable:
+        cached = _cache_path(path_only)
+        if cached.is_file():
+            return _serve_cached(request, cached)
+
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in _SKIP_REQUEST_HEADERS}
+    upstream_request = client.build_request(request.method, target_path, headers=headers)
+    upstream = await client.send(upstream_request, stream=True)
+
+    response_headers = {k: v for k, v in upstream.headers.items() if k.lower() in _PASS_RESPONSE_HEADERS}
+    body = upstream.aiter_raw()
+    if (
+        immutable
+        and upstream.status_code == 200
+        and "range" not in request.headers
+        and "content-encoding" not in upstream.headers
+    ):
+        body = _tee_to_cache(body, _cache_path(path_only))
+        response_headers["cache-control"] = _IMMUTABLE_CACHE_CONTROL
+
+    return StreamingResponse(
+        body,
+        status_code=upstream.status_code,
+        headers=response_headers,
+        background=BackgroundTask(upstream.aclose),
+    )
+
+
+__all__ = ["forward"]
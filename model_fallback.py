@@ -0,0 +1,295 @@
+"""Model Fallback Engine - Shared Gemini model selection with circuit breakers.
+
+Every ai_brain entry point used to walk MODEL_IDS x ("models/" prefix, bare
+id) x 2 attempts on every request, sleeping 2s on each 429. The engine
+below keeps per-model health across requests instead:
+
+- closed:    model is healthy and tried in MODEL_IDS order
+- open:      model is skipped until its cooldown ends (quota reset time for
+             429s, long cooldown for 404s, short backoff for other errors)
+- half_open: cooldown ended; exactly one request probes the model and its
+             result closes or re-opens the breaker
+
+While every breaker is open, one forced probe per MODEL_ERROR_COOLDOWN goes
+to the model closest to recovery; all other requests fail at once.
+Errors caused by the request itself (invalid argument, safety block, bad
+upload) are raised as RequestRejected and do not count against any model.
+
+It also learns which id form ("gemini-x" vs "models/gemini-x") a model
+answered to, so later requests go straight to that variant.
+
+Usage:
+    engine = ModelFallbackEngine(MODEL_IDS, label="AI Brain")
+    text, model_id = engine.call(lambda model_id: build(model_id).generate_content(prompt).text)
+"""
+import re
+import threading
+import time
+
+from config import (
+    MODEL_ERROR_COOLDOWN,
+    MODEL_FAILURE_THRESHOLD,
+    MODEL_NOT_FOUND_COOLDOWN,
+    MODEL_QUOTA_COOLDOWN,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Upper bound for exponential backoff on repeated generic failures
+MAX_ERROR_COOLDOWN = 600
+
+_STATUS_RE = re.compile(r"^\s*(\d{3})\b")
+_RETRY_IN_RE = re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE)
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+
+class ModelsExhausted(Exception):
+    """Raised when every model failed (or is cooling down) for a request."""
+
+    def __init__(self, last_error: str):
+        super().__init__(last_error)
+        self.last_error = last_error
+
+
+class RequestRejected(ModelsExhausted):
+    """The request itself was refused (bad input, safety block); other models would refuse it too."""
+
+
+# SDK exceptions raised for the request rather than the model
+_REQUEST_ERRORS = {"InvalidArgument", "FailedPrecondition", "BadRequest",
+                   "BlockedPromptException", "StopCandidateException"}
+
+
+def _status_code(error: Exception):
+    """HTTP status of an SDK error: `code` attribute, else the leading "NNN ..." of the message."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    match = _STATUS_RE.match(str(error))
+    return int(match.group(1)) if match else None
+
+
+def _classify(error: Exception) -> str:
+    """Map an SDK error to request | quota | not_found | error."""
+    status = _status_code(error)
+    msg = str(error).lower()
+    if status == 429 or "resource_exhausted" in msg or "resource exhausted" in msg:
+        return "quota"
+    if status == 404 or "is not supported for" in msg:
+        return "not_found"
+    if type(error).__name__ in _REQUEST_ERRORS or status in (400, 413, 415, 422):
+        return "request"
+    # response.text on a reply whose candidate was blocked (finish_reason SAFETY etc.)
+    if isinstance(error, ValueError) and "finish_reason" in msg:
+        return "request"
+    return "error"
+
+
+def _quota_reset_seconds(error_msg: str) -> float:
+    """Use the server-provided retry delay when the 429 carries one."""
+    for pattern in (_RETRY_IN_RE, _RETRY_DELAY_RE):
+        match = pattern.search(error_msg)
+        if match:
+            return max(1.0, float(match.group(1)))
+    return MODEL_QUOTA_COOLDOWN
+
+
+class _ModelHealth:
+    """Circuit breaker state for one base model id."""
+
+    def __init__(self, base_id: str):
+        self.base_id = base_id
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.failures = 0
+        self.trips = 0
+        self.probing = False
+        self.preferred_variant = None
+        self.bad_variants = {}  # variant id -> unix time it may be retried
+        self.last_error = ""
+
+    def variants(self, now: float) -> list:
+        """Id forms to try, learned form first, skipping recent 404s."""
+        if self.base_id.startswith("models/"):
+            forms = [self.base_id]
+        else:
+            forms = [f"models/{self.base_id}", self.base_id]
+        if self.preferred_variant in forms:
+            forms.remove(self.preferred_variant)
+            forms.insert(0, self.preferred_variant)
+        return [v for v in forms if self.bad_variants.get(v, 0) <= now]
+
+    def stats(self, now: float) -> dict:
+        return {
+            "state": self.state,
+            "retry_in": round(max(0.0, self.open_until - now), 1),
+            "failures": self.failures,
+            "trips": self.trips,
+            "variant": self.preferred_variant,
+            "last_error": self.last_error[:120],
+        }
+
+
+class ModelFallbackEngine:
+    """Picks the first healthy model for each request and records outcomes."""
+
+    def __init__(self, model_ids: list, label: str = "AI Brain"):
+        self.label = label
+        self._lock = threading.Lock()
+        self._health = {base_id: _ModelHealth(base_id) for base_id in model_ids}
+        self._order = list(model_ids)
+        self._next_forced = 0.0  # earliest time for the next forced probe
+
+    # ------------------------------------------------------------------
+    # Selection
+    # ------------------------------------------------------------------
+
+    def _acquire(self, skip: set):
+        """
+        Return (health, variants) for the next model to try, or None.
+        Open breakers whose cooldown elapsed become half-open and are handed
+        to a single caller as a probe.
+        """
+        now = time.time()
+        with self._lock:
+            for base_id in self._order:
+                if base_id in skip:
+                    continue
+                health = self._health[base_id]
+                if health.state == OPEN and health.open_until <= now:
+                    health.state = HALF_OPEN
+                if health.state == CLOSED or (health.state == HALF_OPEN and not health.probing):
+                    variants = health.variants(now)
+                    if not variants:
+                        continue
+                    if health.state == HALF_OPEN:
+                        health.probing = True
+                    return health, variants
+        return None
+
+    def _acquire_forced(self, skip: set):
+        """
+        Every breaker is open: probe the one closest to recovery, at most
+        once per MODEL_ERROR_COOLDOWN, so the pool is not silent for a whole
+        quota window. Only a request that has not reached any model yet
+        may force one. Variants blacklisted after a 404 are never forced.
+        """
+        if skip:
+            return None
+        now = time.time()
+        with self._lock:
+            if now < self._next_forced or any(h.probing for h in self._health.values()):
+                return None
+            candidates = [
+                h for b, h in self._health.items()
+                if b not in skip and h.state != CLOSED and h.variants(now)
+            ]
+            if not candidates:
+                return None
+            self._next_forced = now + MODEL_ERROR_COOLDOWN
+            health = min(candidates, key=lambda h: h.open_until)
+            health.state = HALF_OPEN
+            health.probing = True
+            return health, health.variants(now)
+
+    # ------------------------------------------------------------------
+    # Outcome bookkeeping
+    # ------------------------------------------------------------------
+
+    def _record_success(self, health: _ModelHealth, variant: str):
+        with self._lock:
+            health.state = CLOSED
+            health.open_until = 0.0
+            health.failures = 0
+            health.trips = 0
+            health.probing = False
+            health.preferred_variant = variant
+            health.bad_variants.pop(variant, None)
+
+    def _record_failure(self, health: _ModelHealth, variant: str, error_msg: str, kind: str) -> bool:
+        """Update the breaker; return True if the next variant of this model is worth trying."""
+        now = time.time()
+        with self._lock:
+            health.last_error = error_msg
+            if kind == "not_found":
+                health.bad_variants[variant] = now + MODEL_NOT_FOUND_COOLDOWN
+                if health.preferred_variant == variant:
+                    health.preferred_variant = None
+                if health.variants(now):
+                    return True
+                self._trip(health, now + MODEL_NOT_FOUND_COOLDOWN)
+            elif kind == "quota":
+                self._trip(health, now + _quota_reset_seconds(error_msg))
+            else:
+                health.failures += 1
+                if health.state == HALF_OPEN or health.failures >= MODEL_FAILURE_THRESHOLD:
+                    backoff = min(MAX_ERROR_COOLDOWN, MODEL_ERROR_COOLDOWN * (2 ** health.trips))
+                    self._trip(health, now + backoff)
+                else:
+                    health.probing = False
+            return False
+
+    def _trip(self, health: _ModelHealth, until: float):
+        health.state = OPEN
+        health.open_until = until
+        health.trips += 1
+        health.probing = False
+
+    def _release(self, health: _ModelHealth):
+        with self._lock:
+            health.probing = False
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def call(self, fn, label: str = None):
+        """
+        Run fn(model_id) against the healthiest model available.
+        Returns (result, model_id); raises ModelsExhausted with the last
+        upstream error once no candidate is left.
+        """
+        label = label or self.label
+        tried = set()
+        last_error = "No model available (all circuit breakers open)"
+
+        while True:
+            picked = self._acquire(tried) or self._acquire_forced(tried)
+            if picked is None:
+                raise ModelsExhausted(last_error)
+            health, variants = picked
+            tried.add(health.base_id)
+
+            try:
+                for variant in variants:
+                    try:
+                        result = fn(variant)
+                    except Exception as e:
+                        last_error = str(e)
+                        kind = _classify(e)
+                        print(f"[{self.label}] {label} via {variant} failed ({kind}): {last_error[:100]}", flush=True)
+                        if kind == "request":
+                            raise RequestRejected(last_error) from e
+                        if self._record_failure(health, variant, last_error, kind):
+                            continue
+                        break
+                    self._record_success(health, variant)
+                    print(f"[{self.label}] {label} success with {variant}", flush=True)
+                    return result, variant
+            finally:
+                self._release(health)
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            return {base_id: self._health[base_id].stats(now) for base_id in self._order}
+
+    def reset(self):
+        """Forget all learned health (e.g. after rotating the API key)."""
+        with self._lock:
+            self._health = {base_id: _ModelHealth(base_id) for base_id in self._order}
+
+
+__all__ = ["ModelFallbackEngine", "ModelsExhausted", "RequestRejected"]
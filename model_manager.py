@@ -0,0 +1,330 @@
+"""Model Manager - Residency scheduler for the local Ollama models.
+
+vision_engine used to load the VL model before every screen question and
+swap straight back to the brain model afterwards, so a burst of vision
+queries paid a full unload/load cycle each time. The manager instead
+decides which models stay resident:
+
+- a requested model is loaded once and stays resident while it is used;
+- if RAM allows (available memory minus the model's size stays above
+  MODEL_MIN_FREE_MB) models co-reside, otherwise the least recently used
+  idle model is evicted first;
+- a model unused for MODEL_IDLE_TIMEOUT seconds is unloaded by a
+  background reaper, which then brings the brain model back (the home
+  model), matching the old "return to brain" behaviour without paying it
+  between back-to-back queries.
+
+Without a way to read available RAM (psutil or /proc/meminfo) only one
+model is kept resident at a time, as before.
+
+Ollama calls (loads and unloads) happen outside the manager's lock: the
+lock only decides what to load or evict and marks it, so a slow Ollama
+never blocks stats(), releases, the reaper or requests for a model that
+is already resident. Callers asking for a model that is loading or
+unloading wait for that call instead of racing it.
+
+Usage:
+    from model_manager import model_manager
+    with model_manager.hold(model_manager.vision_model):
+        ...                            # VL model resident, cannot be evicted
+    # released: stays warm until idle (no immediate unload)
+"""
+import asyncio
+import contextlib
+import threading
+import time
+
+from config import MODEL_BRAIN, OLLAMA_VISION_MODEL, MODEL_IDLE_TIMEOUT, MODEL_MIN_FREE_MB
+
+# Size assumed for a model before Ollama has reported its real footprint
+DEFAULT_MODEL_MB = 4096
+
+ollama = None
+
+
+def _lazy_import_ollama():
+    global ollama
+    if ollama is None:
+        import ollama as _ollama
+        ollama = _ollama
+    return ollama
+
+
+def _canonical_name(name: str) -> str:
+    """Ollama's name for a model: an untagged "phi3" is "phi3:latest" (as `ollama ps` reports it)."""
+    if name and ":" not in name.rsplit("/", 1)[-1]:
+        return f"{name}:latest"
+    return name
+
+
+def available_memory_mb():
+    """Available system RAM in MB, or None if it cannot be determined."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available // (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+class _ModelState:
+    def __init__(self, name: str):
+        self.name = name
+        self.resident = False
+        self.loading = None    # threading.Event while a load is in flight
+        self.unloading = None  # threading.Event while an unload is in flight
+        self.in_use = 0
+        self.last_used = 0.0
+        self.size_mb = None
+        self.loads = 0
+        self.unloads = 0
+        self.hits = 0
+        self.load_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "resident": self.resident,
+            "in_use": self.in_use,
+            "idle_s": round(time.monotonic() - self.last_used, 1) if self.last_used else None,
+            "size_mb": self.size_mb,
+            "loads": self.loads,
+            "unloads": self.unloads,
+            "hits": self.hits,
+            "avg_load_s": round(self.load_seconds / self.loads, 2) if self.loads else 0.0,
+        }
+
+
+class ModelManager:
+    """Keeps Ollama models resident according to RAM, recent use and an idle timeout."""
+
+    def __init__(self, brain_model: str, vision_model: str, idle_timeout: float, min_free_mb: int):
+        self.brain_model = brain_model
+        self.vision_model = vision_model
+        self.idle_timeout = idle_timeout
+        self.min_free_mb = min_free_mb
+        self._lock = threading.RLock()
+        self._models = {}
+        self._reaper = None
+        self.evictions = 0
+
+    def _state(self, name: str) -> _ModelState:
+        key = _canonical_name(name)
+        if key not in self._models:
+            self._models[key] = _ModelState(name)
+        return self._models[key]
+
+    # --- Ollama operations ---
+    def _load(self, state: _ModelState) -> float:
+        """Load `state` (called without the lock); returns the seconds it took."""
+        client = _lazy_import_ollama()
+        print(f"[Model Manager] Loading {state.name}...")
+        start = time.perf_counter()
+        # Empty prompt loads the model; keep_alive=-1 leaves unloading to us
+        client.generate(model=state.name, prompt="", keep_alive=-1)
+        return time.perf_counter() - start
+
+    def _mark_unloading(self, state: _ModelState):
+        """Take `state` out of residency (caller holds the lock); _unload() does the Ollama call."""
+        state.resident = False
+        state.unloading = threading.Event()
+
+    def _unload(self, states):
+        """Unload models marked by _mark_unloading (called without the lock)."""
+        client = _lazy_import_ollama()
+        for state in states:
+            try:
+                client.generate(model=state.name, prompt="", keep_alive=0)
+                print(f"[Model Manager] Unloaded {state.name}")
+            except Exception as e:
+                print(f"[Model Manager] Unload {state.name} failed: {e}")
+            with self._lock:
+                state.unloads += 1
+                state.unloading.set()
+                state.unloading = None
+
+    def _learn_sizes(self):
+        """Record real model footprints from `ollama ps`."""
+        try:
+            entries = ollama.ps().get("models", [])
+        except Exception:
+            return
+        with self._lock:
+            for entry in entries:
+                state = self._models.get(_canonical_name(entry.get("model") or entry.get("name")))
+                if state is not None and entry.get("size"):
+                    state.size_mb = entry["size"] // (1024 * 1024)
+
+    def _fits(self, state: _ModelState, freed_mb: int = 0) -> bool:
+        available = available_memory_mb()
+        if available is None:
+            return False
+        return available + freed_mb - (state.size_mb or DEFAULT_MODEL_MB) >= self.min_free_mb
+
+    def _make_room(self, state: _ModelState) -> list:
+        """
+        Pick idle resident models, least recently used first, until `state`
+        fits (caller holds the lock). They are marked unloading; the caller
+        unloads them after releasing the lock.
+        """
+        others = sorted(
+            (s for s in self._models.values() if s.resident and s is not state and s.in_use == 0),
+            key=lambda s: s.last_used,
+        )
+        victims, freed_mb = [], 0
+        for other in others:
+            if self._fits(state, freed_mb):
+                break
+            self._mark_unloading(other)
+            victims.append(other)
+            freed_mb += other.size_mb or DEFAULT_MODEL_MB
+            self.evictions += 1
+        return victims
+
+    # --- public API ---
+    def ensure(self, name: str, hold: bool = False):
+        """Make `name` resident. With hold=True it cannot be evicted until release()."""
+        while True:
+            with self._lock:
+                state = self._state(name)
+                if state.resident:
+                    state.hits += 1
+                    state.last_used = time.monotonic()
+                    if hold:
+                        state.in_use += 1
+                    break
+                busy = state.loading or state.unloading
+                if busy is None:
+                    victims = self._make_room(state)
+                    state.loading = threading.Event()
+            if busy is not None:
+                busy.wait()  # another caller is loading/unloading it; re-check (a load may have failed)
+                continue
+            try:
+                self._unload(victims)
+                elapsed = self._load(state)
+            except BaseException:
+                with self._lock:
+                    state.loading.set()
+                    state.loading = None
+                raise
+            with self._lock:
+                state.resident = True
+                state.loads += 1
+                state.load_seconds += elapsed
+                state.last_used = time.monotonic()
+                if hold:
+                    state.in_use += 1
+                state.loading.set()
+                state.loading = None
+            print(f"[Model Manager] {state.name} resident in {elapsed:.1f}s")
+            self._learn_sizes()
+            break
+        self._start_reaper()
+
+    def release(self, name: str):
+        """Done using `name`; it stays resident until idle or evicted."""
+        with self._lock:
+            state = self._state(name)
+            state.in_use = max(0, state.in_use - 1)
+            state.last_used = time.monotonic()
+
+    @contextlib.contextmanager
+    def hold(self, name: str):
+        """Keep `name` resident (and unevictable) for the duration of the block."""
+        self.ensure(name, hold=True)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    @contextlib.asynccontextmanager
+    async def hold_async(self, name: str):
+        """hold() for the event loop: the load runs on a worker thread."""
+        acquired = asyncio.ensure_future(asyncio.to_thread(self.ensure, name, True))
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            # The thread finishes the load regardless; drop its hold when it does
+            acquired.add_done_callback(lambda t: t.cancelled() or t.exception() or self.release(name))
+            raise
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def unload(self, name: str):
+        """Unload `name` now unless something still holds it."""
+        with self._lock:
+            state = self._state(name)
+            if not (state.resident and state.in_use == 0):
+                return
+            self._mark_unloading(state)
+        self._unload([state])
+
+    def switch_to_vision(self):
+        """Compatibility: ensure the VL model is resident and hold it for a query."""
+        self.ensure(self.vision_model, hold=True)
+
+    def switch_to_brain(self):
+        """Compatibility: the vision query is done. The VL model stays warm for the next one."""
+        self.release(self.vision_model)
+
+    def reap_idle(self):
+        """Unload models idle longer than idle_timeout; bring the brain back afterwards."""
+        now = time.monotonic()
+        brain = self._state(self.brain_model) if self.brain_model else None
+        with self._lock:
+            idle = [
+                state for state in self._models.values()
+                if state.resident and state.in_use == 0 and state is not brain
+                and now - state.last_used > self.idle_timeout
+            ]
+            for state in idle:
+                self._mark_unloading(state)
+        self._unload(idle)
+        if idle and brain is not None and not brain.resident:
+            try:
+                self.ensure(self.brain_model)
+            except Exception as e:
+                print(f"[Model Manager] Brain reload failed: {e}")
+
+    def _start_reaper(self):
+        if self._reaper is not None or self.idle_timeout <= 0:
+            return
+
+        def loop():
+            interval = max(1.0, min(30.0, self.idle_timeout / 4))
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap_idle()
+                except Exception as e:
+                    print(f"[Model Manager] Reaper error: {e}")
+
+        self._reaper = threading.Thread(target=loop, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "available_mb": available_memory_mb(),
+                "evictions": self.evictions,
+                "models": {state.name: state.stats() for state in self._models.values()},
+            }
+
+
+model_manager = ModelManager(
+    brain_model=MODEL_BRAIN,
+    vision_model=OLLAMA_VISION_MODEL,
+    idle_timeout=MODEL_IDLE_TIMEOUT,
+    min_free_mb=MODEL_MIN_FREE_MB,
+)
+
+__all__ = ["ModelManager", "model_manager", "available_memory_mb"]
@@ -0,0 +1,100 @@
+"""Model Registry - Build each Gemini GenerativeModel once and reuse it.
+
+ai_brain used to construct `genai.GenerativeModel(model_id, safety_settings=...)`
+on every attempt of every request, re-normalizing the safety settings and
+generation config each time. The registry keeps one instance per
+(model id, safety settings, generation config) and hands the same object
+to every caller. All instances share the SDK's default generative client,
+so the underlying HTTP/gRPC connection is reused as well.
+
+`warm_up()` pre-builds the instances at server startup and can optionally
+open the upstream connection with a free count_tokens call, so the first
+real request does not pay connection setup.
+
+Usage:
+    model = model_registry.get("gemini-2.5-flash", safety_settings=SAFETY_SETTINGS)
+"""
+import json
+import threading
+import time
+
+import google.generativeai as genai
+
+
+def _freeze(value) -> str:
+    """Stable key for settings given as dicts/lists."""
+    if value is None:
+        return ""
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class ModelRegistry:
+    """Thread-safe cache of GenerativeModel instances."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        # Fast path keyed on argument identity; values keep the argument objects
+        # alive so their ids cannot be reused while cached
+        self._by_identity = {}
+        self.builds = 0
+        self.hits = 0
+        self.build_seconds = 0.0
+
+    def get(self, model_id: str, safety_settings=None, generation_config: dict = None):
+        identity = (model_id, id(safety_settings), id(generation_config))
+        cached = self._by_identity.get(identity)
+        if cached is not None:
+            self.hits += 1
+            return cached[0]
+
+        key = (model_id, _freeze(safety_settings), _freeze(generation_config))
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                start = time.perf_counter()
+                model = genai.GenerativeModel(
+                    model_id,
+                    safety_settings=safety_settings,
+                    generation_config=generation_config,
+                )
+                self.build_seconds += time.perf_counter() - start
+                self.builds += 1
+                self._models[key] = model
+            else:
+                self.hits += 1
+            self._by_identity[identity] = (model, safety_settings, generation_config)
+        return model
+
+    def warm_up(self, model_ids: list, safety_settings=None, generation_configs: list = (None,), network: bool = False):
+        """
+        Pre-build models for every id x generation config. With network=True,
+        also open the upstream connection via count_tokens (no generation
+        quota is used) on the first model that answers.
+        """
+        start = time.perf_counter()
+        for model_id in model_ids:
+            for generation_config in generation_configs:
+                self.get(model_id, safety_settings=safety_settings, generation_config=generation_config)
+
+        if network:
+            for model_id in model_ids:
+                try:
+                    self.get(model_id, safety_settings=safety_settings).count_tokens("ping")
+                    print(f"[Model Registry] Upstream connection warmed via {model_id}")
+                    break
+                except Exception as e:
+                    print(f"[Model Registry] Warm-up via {model_id} failed: {str(e)[:100]}")
+
+        print(f"[Model Registry] Warm-up: {len(self._models)} models ready in {time.perf_counter() - start:.2f}s")
+
+    def stats(self) -> dict:
+        return {
+            "models": len(self._models),
+            "builds": self.builds,
+            "hits": self.hits,
+            "build_ms": round(self.build_seconds * 1000, 2),
+        }
+
+
+__all__ = ["ModelRegistry"]
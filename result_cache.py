@@ -0,0 +1,258 @@
+"""Result Cache - Content-addressed cache for AI analysis results.
+
+The same uploaded report is usually analyzed several times (patient, nurse
+and doctor each open it), and every analysis used to cost a full Gemini
+round-trip plus quota. Results are keyed by a SHA-256 of the uploaded bytes
+together with the prompt version and model list, so identical inputs map to
+the same entry no matter who uploads them.
+
+Two tiers:
+- memory: LRU bounded by entry count (and optionally by total bytes)
+- disk:   optional directory of JSON/bytes files with TTL and a size cap;
+          survives restarts and is shared by every worker on the host.
+          Each process keeps an index of the files (age order, sizes) so
+          eviction never lists the directory; the index is built with one
+          scan at startup and learns other workers' files when it reads them.
+
+Usage:
+    cache = ResultCache("analysis", max_entries=256, disk_dir="cache/analysis")
+    key = ResultCache.make_key("report", PROMPT_VERSION, image_bytes)
+    result = cache.get(key)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+def _size_of(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional disk) cache with hit/miss counters."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 256,
+        ttl: float = 0,
+        max_memory_bytes: int = 0,
+        disk_dir: str = None,
+        max_disk_bytes: int = 0,
+    ):
+        """
+        Args:
+            name: Label used in logs and stats
+            max_entries: Memory tier capacity (0 disables the memory tier)
+            ttl: Seconds an entry stays valid in either tier (0 = forever)
+            max_memory_bytes: Optional byte budget for the memory tier
+            disk_dir: Directory for the disk tier (None disables it)
+            max_disk_bytes: Disk tier budget; oldest files are evicted first
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, stored_at, size)
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # file name -> (stored_at, size), oldest first
+        self._disk_bytes = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_scan()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Hash any mix of bytes/str parts into a stable cache key."""
+        digest = hashlib.sha256()
+        for part in parts:
+            if part is None:
+                part = b""
+            elif not isinstance(part, (bytes, bytearray, memoryview)):
+                part = str(part).encode("utf-8")
+            digest.update(hashlib.sha256(part).digest())
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+
+    def _expired(self, stored_at: float) -> bool:
+        return bool(self.ttl) and time.time() - stored_at > self.ttl
+
+    def _memory_put(self, key: str, value, stored_at: float):
+        if not self.max_entries:
+            return
+        size = _size_of(value)
+        if self.max_memory_bytes and size > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[2]
+        self._memory[key] = (value, stored_at, size)
+        self._memory_bytes += size
+        while self._memory and (
+            len(self._memory) > self.max_entries
+            or (self.max_memory_bytes and self._memory_bytes > self.max_memory_bytes)
+        ):
+            _, (_, _, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self._counters["evictions"] += 1
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+
+    def _disk_path(self, key: str, raw: bool) -> Path:
+        return self.disk_dir / f"{key}.{'bin' if raw else 'json'}"
+
+    def _disk_scan(self):
+        """Build the index from the directory (once, at startup)."""
+        entries = []
+        for path in self.disk_dir.iterdir():
+            if path.suffix not in (".json", ".bin"):
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path.name))
+        for stored_at, size, name in sorted(entries):
+            self._disk[name] = (stored_at, size)
+            self._disk_bytes += size
+        self._disk_evict()
+
+    def _disk_track(self, name: str, stored_at: float, size: int):
+        self._disk_forget(name)
+        self._disk[name] = (stored_at, size)
+        self._disk_bytes += size
+        # A file another worker wrote earlier than our newest entry: keep age order
+        if len(self._disk) > 1 and stored_at < next(reversed(self._disk.values()))[0]:
+            self._disk = OrderedDict(sorted(self._disk.items(), key=lambda item: item[1][0]))
+
+    def _disk_forget(self, name: str):
+        entry = self._disk.pop(name, None)
+        if entry is not None:
+            self._disk_bytes -= entry[1]
+
+    def _disk_remove(self, path: Path):
+        path.unlink(missing_ok=True)
+        self._disk_forget(path.name)
+
+    def _disk_get(self, key: str):
+        for raw in (False, True):
+            path = self._disk_path(key, raw)
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                self._disk_forget(path.name)
+                continue
+            if self._expired(st.st_mtime):
+                self._disk_remove(path)
+                return None, 0.0
+            if path.name not in self._disk:
+                self._disk_track(path.name, st.st_mtime, st.st_size)
+            try:
+                data = path.read_bytes()
+                return (data if raw else json.loads(data)), st.st_mtime
+            except (OSError, ValueError) as e:
+                print(f"[Cache] {self.name}: unreadable entry {path.name}: {e}")
+                self._disk_remove(path)
+        return None, 0.0
+
+    def _disk_put(self, key: str, value):
+        raw = isinstance(value, (bytes, bytearray))
+        path = self._disk_path(key, raw)
+        tmp = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+        data = bytes(value) if raw else json.dumps(value, default=str).encode("utf-8")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[Cache] {self.name}: disk write failed: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        self._disk_track(path.name, time.time(), len(data))
+        self._disk_evict()
+
+    def _disk_evict(self):
+        """Drop expired entries, then the oldest ones until under max_disk_bytes (index only, no listing)."""
+        while self._disk:
+            name, (stored_at, _) = next(iter(self._disk.items()))
+            over_budget = self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes
+            if not over_budget and not self._expired(stored_at):
+                break
+            self._disk_remove(self.disk_dir / name)
+            self._counters["evictions"] += 1
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get(self, key: str):
+        """Return the cached value or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, stored_at, _ = entry
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                self._memory_bytes -= self._memory.pop(key)[2]
+
+            if self.disk_dir:
+                value, stored_at = self._disk_get(key)
+                if value is not None:
+                    self._memory_put(key, value, stored_at)
+                    self._counters["disk_hits"] += 1
+                    return value
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value):
+        """Store a JSON-serializable value (or raw bytes) in every enabled tier."""
+        with self._lock:
+            self._memory_put(key, value, time.time())
+            if self.disk_dir:
+                self._disk_put(key, value)
+            self._counters["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self.disk_dir:
+                for path in self.disk_dir.iterdir():
+                    if path.suffix in (".json", ".bin"):
+                        path.unlink(missing_ok=True)
+                self._disk.clear()
+                self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk": str(self.disk_dir) if self.disk_dir else None,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+__all__ = ["ResultCache"]
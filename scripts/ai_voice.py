@@ -1,82 +1,720 @@
 import asyncio
 import base64
+import contextlib
 import json
+import itertools
 import os
+import secrets
+import struct
+import time
+from collections import deque
 from google import genai
-from config import GEMINI_API_KEY
+from config import (
+    GEMINI_API_KEY, VOICE_FRAME_MS, VOICE_QUEUE_FRAMES,
+    VOICE_MAX_SESSIONS, VOICE_SESSION_WAIT, VOICE_PREWARM_SESSIONS, VOICE_PREWARM_MAX_AGE,
+    VOICE_RESUME_GRACE, VOICE_RESUME_BUFFER_FRAMES,
+)
 
 # Multimodal Live API Target
 MODEL_ID = "gemini-2.5-flash-live-api"
 
-async def manage_voice_session(websocket):
+# Configuration for Voice-to-Voice
+# We request AUDIO as response modality
+SESSION_CONFIG = {
+    "generation_config": {
+        "response_modalities": ["AUDIO"]
+    },
+    "system_instruction": "You are a professional Medical AI Assistant. Keep your answers concise, helpful, and natural for a voice conversation. You are part of the MedicalHub network."
+}
+
+# --- Wire protocols ---
+# "json" (default): every message is a JSON text frame, audio as base64
+#     {"type": "audio", "data": <base64 PCM>} / {"type": "text", "text": ...}
+# "binary": audio travels as binary frames, everything else stays JSON text.
+#     Binary frame = 4-byte header + raw PCM (int16 LE mono; 16 kHz from the
+#     browser, 24 kHz from Gemini):
+#       kind  u8   FRAME_AUDIO
+#       flags u8   reserved, 0
+#       seq   u16  big-endian, per direction, wraps at 65535
+# Clients ask for "binary" with the Sec-WebSocket-Protocol BINARY_SUBPROTOCOL
+# (or ?protocol=binary); anything else gets the JSON protocol.
+# In both, the client hangs up with the text frame {"type": "end"}, which
+# closes the Gemini session at once instead of keeping it resumable.
+BINARY_SUBPROTOCOL = "medvoice.pcm.v1"
+FRAME_HEADER = struct.Struct("!BBH")
+FRAME_AUDIO = 1
+
+def negotiate_protocol(websocket):
+    """Return (protocol, subprotocol to accept with) for a connecting client."""
+    if BINARY_SUBPROTOCOL in (websocket.scope.get("subprotocols") or []):
+        return "binary", BINARY_SUBPROTOCOL
+    if websocket.query_params.get("protocol") == "binary":
+        return "binary", None
+    return "json", None
+
+def pack_audio(seq: int, pcm: bytes) -> bytes:
+    return FRAME_HEADER.pack(FRAME_AUDIO, 0, seq & 0xFFFF) + pcm
+
+def unpack_frame(frame: bytes):
+    """Split a binary frame into (kind, seq, payload)."""
+    kind, _, seq = FRAME_HEADER.unpack_from(frame)
+    return kind, seq, frame[FRAME_HEADER.size:]
+
+# PCM formats (int16 mono): browser mic in, Gemini speech out
+INPUT_RATE = 16000
+OUTPUT_RATE = 24000
+
+# Replay buffer size while no browser is attached: everything the model says
+# during the grace period (at playback rate) on top of the normal replay window
+DETACHED_BUFFER_FRAMES = VOICE_RESUME_BUFFER_FRAMES + int(VOICE_RESUME_GRACE * 1000 / VOICE_FRAME_MS)
+
+class JitterBuffer:
+    """Re-chunk an irregular PCM byte stream into fixed-size frames."""
+
+    def __init__(self, frame_bytes: int):
+        self.frame_bytes = frame_bytes
+        self._buffer = bytearray()
+
+    def push(self, pcm: bytes) -> list:
+        self._buffer += pcm
+        usable = len(self._buffer) - len(self._buffer) % self.frame_bytes
+        frames = [bytes(self._buffer[i:i + self.frame_bytes]) for i in range(0, usable, self.frame_bytes)]
+        del self._buffer[:usable]
+        return frames
+
+    def flush(self) -> list:
+        """Emit the partial tail frame (end of a turn)."""
+        tail, self._buffer = bytes(self._buffer), bytearray()
+        return [tail] if tail else []
+
+class _DirectionStats:
+    """Counters for one direction of a session (client->gemini or gemini->client)."""
+
+    def __init__(self):
+        self.frames = 0
+        self.dropped = 0
+        self.merged = 0
+        self.max_depth = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, latency: float):
+        self.frames += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def as_dict(self) -> dict:
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "max_queue_depth": self.max_depth,
+            "avg_latency_ms": round(self.latency_total / self.frames * 1000, 2) if self.frames else 0.0,
+            "max_latency_ms": round(self.latency_max * 1000, 2),
+        }
+
+class FrameQueue:
+    """
+    Bounded single-producer/single-consumer queue between the two sockets.
+    `put` never blocks: once `max_frames` audio frames are waiting, the
+    policy decides what gives -
+      "merge"       append the new PCM to the newest queued frame (no audio
+                    lost, fewer upstream sends) up to `max_merge` frames' worth,
+                    then fall back to dropping
+      "drop_oldest" discard the oldest queued audio (stale playback is worse
+                    than a gap)
+    Control/text items are never dropped.
+    """
+
+    def __init__(self, max_frames: int, policy: str, stats: _DirectionStats, max_merge: int = 4):
+        self.max_frames = max(1, max_frames)
+        self.policy = policy
+        self.stats = stats
+        self.max_merge = max_merge
+        self._items = deque()  # [kind, payload, enqueued_at]
+        self._audio = 0
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def put(self, kind: str, payload):
+        now = time.monotonic()
+        if kind == "audio" and self._audio >= self.max_frames:
+            if self.policy == "merge" and self._items and self._items[-1][0] == "audio":
+                newest = self._items[-1]
+                if len(newest[1]) + len(payload) <= len(payload) * self.max_merge:
+                    newest[1] += payload
+                    self.stats.merged += 1
+                    return
+            for item in self._items:
+                if item[0] == "audio":
+                    self._items.remove(item)
+                    self._audio -= 1
+                    self.stats.dropped += 1
+                    break
+        self._items.append([kind, payload, now])
+        if kind == "audio":
+            self._audio += 1
+        self.stats.max_depth = max(self.stats.max_depth, len(self._items))
+        self._ready.set()
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
+
+    async def get(self):
+        """Next (kind, payload, enqueued_at), or None once closed and drained."""
+        while not self._items:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        kind, payload, enqueued_at = self._items.popleft()
+        if kind == "audio":
+            self._audio -= 1
+        return kind, payload, enqueued_at
+
+    def drain(self) -> list:
+        """Take everything still queued, oldest first."""
+        items = [(kind, payload) for kind, payload, _ in self._items]
+        self._items.clear()
+        self._audio = 0
+        return items
+
+    def __len__(self):
+        return len(self._items)
+
+# --- Session metrics (reported by /api/health) ---
+_session_ids = itertools.count(1)
+_active_sessions = {}
+_totals = {"sessions": 0, "dropped": 0, "merged": 0}
+
+class SessionMetrics:
+    def __init__(self, protocol: str):
+        self.id = next(_session_ids)
+        self.protocol = protocol
+        self.started = time.monotonic()
+        self.upstream = _DirectionStats()    # browser -> Gemini
+        self.downstream = _DirectionStats()  # Gemini -> browser
+        self.up_queue = None
+        self.down_queue = None
+        self.first_audio = None
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "protocol": self.protocol,
+            "age_s": round(time.monotonic() - self.started, 1),
+            "first_audio_ms": round(self.first_audio * 1000) if self.first_audio is not None else None,
+            "upstream": {**self.upstream.as_dict(), "queue_depth": len(self.up_queue or ())},
+            "downstream": {**self.downstream.as_dict(), "queue_depth": len(self.down_queue or ())},
+        }
+
+def stats(detail: bool = False) -> dict:
+    sessions = list(_active_sessions.values())
+    result = {
+        "active": len(sessions),
+        "total_sessions": _totals["sessions"],
+        "dropped_frames": _totals["dropped"] + sum(m.upstream.dropped + m.downstream.dropped for m in sessions),
+        "merged_frames": _totals["merged"] + sum(m.upstream.merged + m.downstream.merged for m in sessions),
+        "max_sessions": VOICE_MAX_SESSIONS,
+        "waiting": _pool_stats["waiting"],
+        "rejected": _pool_stats["rejected"],
+        "detached": sum(1 for v in _resumable.values() if v.websocket is None),
+        "resumed": _pool_stats["resumed"],
+        "warm": len(_warm),
+        "warm_hits": _pool_stats["warm_hits"],
+        "cold_starts": _pool_stats["cold_starts"],
+        "avg_connect_ms": round(_pool_stats["connect_seconds"] / _pool_stats["connects"] * 1000, 1) if _pool_stats["connects"] else 0.0,
+        "avg_first_audio_ms": round(_pool_stats["first_audio_seconds"] / _pool_stats["first_audio_count"] * 1000, 1) if _pool_stats["first_audio_count"] else 0.0,
+    }
+    if detail:
+        result["sessions"] = [m.as_dict() for m in sessions]
+    return result
+
+# --- Upstream client and Live session pool ---
+# One genai.Client per process (its HTTP/WebSocket transport is reused),
+# at most VOICE_MAX_SESSIONS Live sessions at a time (callers beyond that
+# wait up to VOICE_SESSION_WAIT seconds), and VOICE_PREWARM_SESSIONS
+# sessions kept connected ahead of time so a new consult skips the
+# TLS + session handshake. Warm sessions count against the cap.
+_client = None
+_session_slots = None
+_warm = deque()        # (exit_stack, session, opened_at)
+_warming = 0
+_refill_task = None
+_pool_stats = {"waiting": 0, "rejected": 0, "resumed": 0, "warm_hits": 0, "cold_starts": 0, "connects": 0, "connect_seconds": 0.0, "first_audio_seconds": 0.0, "first_audio_count": 0}
+
+def get_client():
+    """Process-wide Google GenAI Client (supports Multimodal Live)."""
+    global _client
+    if _client is None:
+        _client = genai.Client(
+            api_key=GEMINI_API_KEY,
+            http_options={'api_version': 'v1beta'}
+        )
+    return _client
+
+def _slots() -> asyncio.Semaphore:
+    global _session_slots
+    if _session_slots is None:
+        _session_slots = asyncio.Semaphore(VOICE_MAX_SESSIONS)
+    return _session_slots
+
+async def _open_session():
+    stack = contextlib.AsyncExitStack()
+    start = time.monotonic()
+    try:
+        session = await stack.enter_async_context(get_client().aio.live.connect(model=MODEL_ID, config=SESSION_CONFIG))
+    except BaseException:
+        await stack.aclose()
+        raise
+    _pool_stats["connects"] += 1
+    _pool_stats["connect_seconds"] += time.monotonic() - start
+    return stack, session, time.monotonic()
+
+async def _close_session(stack):
+    try:
+        await stack.aclose()
+    except Exception as e:
+        print(f"[AI Voice] Session close error: {e}")
+
+async def _refill():
+    """Top the warm pool up to VOICE_PREWARM_SESSIONS without breaking the cap."""
+    global _warming
+    while len(_warm) + _warming < VOICE_PREWARM_SESSIONS and len(_active_sessions) + len(_warm) + _warming < VOICE_MAX_SESSIONS:
+        _warming += 1
+        try:
+            _warm.append(await _open_session())
+        except Exception as e:
+            print(f"[AI Voice] Pre-warm failed: {e}")
+            return
+        finally:
+            _warming -= 1
+
+def _schedule_refill():
+    global _refill_task
+    if VOICE_PREWARM_SESSIONS > 0 and GEMINI_API_KEY and (_refill_task is None or _refill_task.done()):
+        _refill_task = asyncio.ensure_future(_refill())
+
+async def _take_session():
+    """A pre-warmed session if a fresh one is ready, else a new one."""
+    while _warm:
+        stack, session, opened_at = _warm.popleft()
+        if time.monotonic() - opened_at <= VOICE_PREWARM_MAX_AGE:
+            _pool_stats["warm_hits"] += 1
+            _schedule_refill()
+            return stack, session
+        await _close_session(stack)  # may have been idled out upstream
+    _pool_stats["cold_starts"] += 1
+    stack, session, _ = await _open_session()
+    return stack, session
+
+def start():
+    """Start pre-warming the session pool in the background (server startup)."""
+    _schedule_refill()
+
+async def shutdown():
+    """Close live and warm sessions (server shutdown)."""
+    if _refill_task is not None:
+        _refill_task.cancel()
+    for voice in list(_resumable.values()):
+        await voice.close()
+    while _warm:
+        await _close_session(_warm.popleft()[0])
+
+def _control(text: str):
+    """A JSON control message as a dict, or None (with a warning) if malformed."""
+    try:
+        message = json.loads(text)
+    except ValueError:
+        message = None
+    if not isinstance(message, dict):
+        print("[AI Voice] Dropped a malformed message from the client")
+        return None
+    return message
+
+async def _client_messages(websocket, protocol: str):
+    """
+    Yield ("audio", bytes) / ("text", str) / ("end", None) from the browser
+    in either protocol. Malformed frames are dropped with a warning.
+    """
+    if protocol == "json":
+        async for text in websocket.iter_text():
+            message = _control(text)
+            if message is None:
+                continue
+            if message.get("type") == "audio":
+                yield "audio", base64.b64decode(message["data"])
+            elif message.get("type") == "text":
+                yield "text", message["text"]
+            elif message.get("type") == "end":
+                yield "end", None
+        return
+
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("bytes") is not None:
+            if len(message["bytes"]) < FRAME_HEADER.size:
+                print(f"[AI Voice] Dropped a {len(message['bytes'])}-byte frame (shorter than its header)")
+                continue
+            kind, _, payload = unpack_frame(message["bytes"])
+            if kind == FRAME_AUDIO:
+                yield "audio", payload
+        elif message.get("text"):
+            control = _control(message["text"])
+            if control is None:
+                continue
+            if control.get("type") == "text":
+                yield "text", control["text"]
+            elif control.get("type") == "end":
+                yield "end", None
+
+async def manage_voice_session(websocket, protocol: str = "json"):
     """
     Bridge between Frontend WebSocket and Gemini Multimodal Live.
     This manages the real-time audio/text loop.
+    `protocol` is the framing agreed at connect ("json" or "binary", see negotiate_protocol).
+
+    The first message is {"type": "session", "token", "resumed"}. If the
+    socket drops, reconnect with ?resume=<token>&last_seq=<last seq seen>
+    within VOICE_RESUME_GRACE seconds to continue the same conversation;
+    audio/text sent after last_seq is replayed. A last_seq the session
+    cannot continue from is refused (error + close 1008; the session
+    stays resumable). {"type": "end"} hangs up for good.
     """
     if not GEMINI_API_KEY:
         print("[AI Voice] Error: GEMINI_API_KEY not found in config.")
         await websocket.close(code=1008)
         return
 
-    # Initialize the new Google GenAI Client (supports Multimodal Live)
-    client = genai.Client(
-        api_key=GEMINI_API_KEY,
-        http_options={'api_version': 'v1beta'}
-    )
-
-    # Configuration for Voice-to-Voice
-    # We request AUDIO as response modality
-    config = {
-        "generation_config": {
-            "response_modalities": ["AUDIO"]
-        },
-        "system_instruction": "You are a professional Medical AI Assistant. Keep your answers concise, helpful, and natural for a voice conversation. You are part of the MedicalHub network."
-    }
+    token = websocket.query_params.get("resume")
+    if token:
+        voice = _resumable.get(token)
+        if voice is not None and not voice.ended:
+            last_seq = websocket.query_params.get("last_seq")
+            try:
+                last_seq = int(last_seq) if last_seq else None
+            except ValueError:
+                last_seq = -1
+            if last_seq is not None and not voice.can_resume_from(last_seq):
+                await websocket.send_json({"type": "error", "message": "Cannot resume from this last_seq"})
+                await websocket.close(code=1008)
+                return
+            _pool_stats["resumed"] += 1
+            print(f"[AI Voice] Session {voice.metrics.id} resumed.")
+            await websocket.send_json({"type": "session", "token": voice.token, "resumed": True})
+            await _serve(voice, websocket, protocol, last_seq)
+            return
+        await websocket.send_json({"type": "session_expired"})
 
-    print(f"[AI Voice] INITIALIZING SESSION WITH MODEL: {MODEL_ID}")
-    
+    slots = _slots()
+    if slots.locked():
+        await websocket.send_json({"type": "queued", "position": _pool_stats["waiting"] + 1})
+    _pool_stats["waiting"] += 1
     try:
-        async with client.aio.live.connect(model=MODEL_ID, config=config) as session:
-            print(f"[AI Voice] SUCCESS: Session Active with {MODEL_ID}")
-
-            async def receive_from_client():
-                """Listen to frontend WebSocket and forward to Gemini."""
-                try:
-                    async for message in websocket.iter_json():
-                        if message.get("type") == "audio":
-                            # Forward base64 audio data to Gemini
-                            await session.send(input={"mime_type": "audio/pcm;rate=16000", "data": message["data"]}, end_of_turn=False)
-                        elif message.get("type") == "text":
-                            # Forward text command
-                            await session.send(input=message["text"], end_of_turn=True)
-                except Exception as e:
-                    print(f"[AI Voice] Client Receive Error: {e}")
-
-            async def send_to_client():
-                """Listen to Gemini stream and forward to frontend."""
-                try:
-                    async for response in session:
-                        if response.data:
-                            # response.data is raw bytes (PCM)
-                            audio_b64 = base64.b64encode(response.data).decode("utf-8")
-                            await websocket.send_json({
-                                "type": "audio",
-                                "data": audio_b64
-                            })
-                        if response.text:
-                            # Optional text transcript from Gemini
-                            await websocket.send_json({
-                                "type": "text",
-                                "text": response.text
-                            })
-                except Exception as e:
-                    print(f"[AI Voice] Gemini Response Error: {e}")
-
-            # Run both bidirectional streams
-            await asyncio.gather(receive_from_client(), send_to_client())
+        await asyncio.wait_for(slots.acquire(), timeout=VOICE_SESSION_WAIT)
+    except asyncio.TimeoutError:
+        _pool_stats["rejected"] += 1
+        print("[AI Voice] All voice sessions busy, caller turned away.")
+        await websocket.send_json({"type": "error", "message": "All voice lines are busy, please try again shortly."})
+        await websocket.close(code=1013)  # Try Again Later
+        return
+    finally:
+        _pool_stats["waiting"] -= 1
 
+    print(f"[AI Voice] INITIALIZING SESSION WITH MODEL: {MODEL_ID} ({protocol} framing)")
+    try:
+        stack, session = await _take_session()
     except Exception as e:
+        slots.release()
+        _schedule_refill()
         print(f"[AI Voice] Session Critical Error: {e}")
         await websocket.send_json({"type": "error", "message": str(e)})
-    finally:
-        print("[AI Voice] Session Closed.")
+        return
+
+    print(f"[AI Voice] SUCCESS: Session Active with {MODEL_ID}")
+    voice = VoiceSession(protocol, stack, session, slots)
+    try:
+        await websocket.send_json({"type": "session", "token": voice.token, "resumed": False})
+    except Exception as e:
+        # Client left while the session was opening: free it and its slot now
+        print(f"[AI Voice] Client gone before the session started: {e!r}")
+        await voice.close()
+        return
+    await _serve(voice, websocket, protocol, None)
+
+async def _serve(voice, websocket, protocol: str, last_seq):
+    """Run one WebSocket attachment; afterwards either park the session for resumption or close it."""
+    try:
+        outcome = await voice.attach(websocket, protocol, last_seq)
+    except Exception as e:
+        print(f"[AI Voice] Session Critical Error: {e}")
+        try:
+            await websocket.send_json({"type": "error", "message": str(e)})
+        except Exception:
+            pass
+        outcome = "failed"
+
+    if outcome == "replaced":
+        return  # a newer socket resumed this session
+    # "hangup", "upstream_done" and "failed" free the session (and its slot) now
+    if outcome == "client_gone" and not voice.ended and VOICE_RESUME_GRACE > 0:
+        voice.detach()
+    else:
+        await voice.close()
+
+# Sessions by token (attached or waiting out their grace period)
+_resumable = {}
+
+class VoiceSession:
+    """
+    One Gemini Live session and its queues, decoupled from the WebSocket.
+
+    Each side reads its socket into a bounded queue and a separate pump
+    writes it out, so a slow browser or a slow upstream only ever costs
+    VOICE_QUEUE_FRAMES of buffered audio - never unbounded memory, and
+    never a stalled reader on the other side. The upstream half runs for
+    the life of the session; the browser half runs per attachment, and a
+    resume takes over from (and closes) any previous attachment.
+
+    Every outgoing item is numbered and kept in `sent` for replay: the last
+    VOICE_RESUME_BUFFER_FRAMES while attached. When the browser drops, the
+    upstream keeps going for VOICE_RESUME_GRACE seconds and model output
+    goes straight into `sent` (up to DETACHED_BUFFER_FRAMES, i.e. the whole
+    grace period at playback rate; anything beyond is counted as dropped),
+    so a reconnect loses neither context nor audio.
+    """
+
+    def __init__(self, protocol: str, stack, session, slots):
+        self.token = secrets.token_urlsafe(16)
+        self.protocol = protocol
+        self.stack = stack
+        self.session = session
+        self._slots = slots
+        self.metrics = SessionMetrics(protocol)
+        self.up_queue = self.metrics.up_queue = FrameQueue(VOICE_QUEUE_FRAMES, "merge", self.metrics.upstream)
+        self.down_queue = self.metrics.down_queue = FrameQueue(VOICE_QUEUE_FRAMES, "drop_oldest", self.metrics.downstream)
+        self.sent = deque()  # (seq, kind, payload), trimmed by _remember
+        self.seq = 0
+        self.websocket = None
+        self.ended = False
+        self._expiry = None
+        self._closed = False
+        self._client_tasks = ()  # reader + pump of the current attachment
+        self._detached = False   # model output goes straight into `sent`
+        self._hangup = False
+        _active_sessions[self.metrics.id] = self.metrics
+        _resumable[self.token] = self
+        self._upstream = [
+            asyncio.ensure_future(self._pump_to_gemini()),
+            asyncio.ensure_future(self._receive_from_gemini()),
+        ]
+
+    # --- upstream half (lives as long as the session) ---
+    async def _pump_to_gemini(self):
+        try:
+            while (item := await self.up_queue.get()) is not None:
+                kind, payload, enqueued_at = item
+                if kind == "audio":
+                    # Forward raw PCM to Gemini
+                    await self.session.send(input={"mime_type": "audio/pcm;rate=16000", "data": payload}, end_of_turn=False)
+                else:
+                    # Forward text command
+                    await self.session.send(input=payload, end_of_turn=True)
+                self.metrics.upstream.record(time.monotonic() - enqueued_at)
+        except Exception as e:
+            print(f"[AI Voice] Gemini Send Error: {e}")
+        finally:
+            self._upstream_ended()
+
+    async def _receive_from_gemini(self):
+        """Listen to Gemini stream and queue frames for the frontend."""
+        metrics = self.metrics
+        jitter = JitterBuffer(OUTPUT_RATE * 2 * VOICE_FRAME_MS // 1000)
+        try:
+            async for response in self.session:
+                if response.data:
+                    # response.data is raw bytes (PCM)
+                    if metrics.first_audio is None:
+                        metrics.first_audio = time.monotonic() - metrics.started
+                        _pool_stats["first_audio_seconds"] += metrics.first_audio
+                        _pool_stats["first_audio_count"] += 1
+                    for frame in jitter.push(response.data):
+                        self._downstream("audio", frame)
+                server_content = getattr(response, "server_content", None)
+                if getattr(server_content, "turn_complete", False):
+                    for frame in jitter.flush():
+                        self._downstream("audio", frame)
+                if response.text:
+                    # Optional text transcript from Gemini
+                    self._downstream("text", response.text)
+        except Exception as e:
+            print(f"[AI Voice] Gemini Response Error: {e}")
+        finally:
+            self._upstream_ended()
+
+    def _downstream(self, kind: str, payload):
+        if self._detached:
+            self._remember(kind, payload)
+        else:
+            self.down_queue.put(kind, payload)
+
+    def _upstream_ended(self):
+        if self.ended:
+            return
+        self.ended = True
+        self.down_queue.close()  # attached pump drains what is left, then the session closes
+        if self.websocket is None:
+            asyncio.ensure_future(self.close())
+
+    # --- browser half (one per attachment) ---
+    async def _receive_from_client(self, websocket, protocol: str):
+        """Listen to frontend WebSocket and queue frames for Gemini."""
+        jitter = JitterBuffer(INPUT_RATE * 2 * VOICE_FRAME_MS // 1000)
+        try:
+            async for kind, payload in _client_messages(websocket, protocol):
+                if kind == "end":
+                    self._hangup = True
+                    return
+                if kind == "audio":
+                    for frame in jitter.push(payload):
+                        self.up_queue.put("audio", frame)
+                else:
+                    # Text command ends the turn: send the buffered audio first
+                    for frame in jitter.flush():
+                        self.up_queue.put("audio", frame)
+                    self.up_queue.put("text", payload)
+        except Exception as e:
+            print(f"[AI Voice] Client Receive Error: {e}")
+        finally:
+            for frame in jitter.flush():
+                self.up_queue.put("audio", frame)
+
+    async def _send(self, websocket, protocol: str, seq: int, kind: str, payload):
+        if kind == "text":
+            await websocket.send_json({"type": "text", "text": payload, "seq": seq & 0xFFFF})
+        elif protocol == "binary":
+            await websocket.send_bytes(pack_audio(seq, payload))
+        else:
+            await websocket.send_json({
+                "type": "audio",
+                "data": base64.b64encode(payload).decode("utf-8"),
+                "seq": seq & 0xFFFF,
+            })
+
+    def _remember(self, kind: str, payload) -> int:
+        """Number an outgoing item and keep it for replay."""
+        seq = self.seq
+        self.seq += 1
+        self.sent.append((seq, kind, payload))
+        limit = DETACHED_BUFFER_FRAMES if self._detached else VOICE_RESUME_BUFFER_FRAMES
+        while len(self.sent) > limit:
+            self.sent.popleft()
+            if self._detached:
+                self.metrics.downstream.dropped += 1  # never reached a browser
+        return seq
+
+    async def _pump_to_client(self, websocket, protocol: str):
+        while (item := await self.down_queue.get()) is not None:
+            kind, payload, enqueued_at = item
+            # Remember before sending: a frame lost with a dying socket is replayed on resume
+            seq = self._remember(kind, payload)
+            await self._send(websocket, protocol, seq, kind, payload)
+            self.metrics.downstream.record(time.monotonic() - enqueued_at)
+
+    def can_resume_from(self, last_seq: int) -> bool:
+        """True if the item after `last_seq` is still buffered (or nothing was sent since)."""
+        if not 0 <= last_seq <= 0xFFFF:
+            return False
+        wanted = (last_seq + 1) & 0xFFFF
+        return wanted == self.seq & 0xFFFF or any(seq & 0xFFFF == wanted for seq, _, _ in self.sent)
+
+    async def _replay(self, websocket, protocol: str, last_seq: int):
+        wanted = (last_seq + 1) & 0xFFFF
+        backlog = list(self.sent)
+        for index, (seq, _, _) in enumerate(backlog):
+            if seq & 0xFFFF == wanted:
+                backlog = backlog[index:]
+                break
+        else:
+            # Validated on connect; only trimmed since (buffer overflow): send what is left
+            if wanted == self.seq & 0xFFFF:
+                backlog = []
+        for seq, kind, payload in backlog:
+            await self._send(websocket, protocol, seq, kind, payload)
+
+    async def attach(self, websocket, protocol: str, last_seq=None) -> str:
+        """
+        Serve this session on `websocket` until it ends. Returns
+        "client_gone", "upstream_done", "hangup" (client sent "end") or
+        "replaced" (another socket resumed).
+        """
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+        self._detached = False
+        previous, self.websocket = self.websocket, websocket
+        if previous is not None:
+            # Takeover: stop the old reader/pump before this socket reads or writes anything
+            for task in self._client_tasks:
+                task.cancel()
+            await asyncio.gather(*self._client_tasks, return_exceptions=True)
+            with contextlib.suppress(Exception):
+                await previous.send_json({"type": "session_replaced"})
+                await previous.close(code=4001)
+        if last_seq is not None:
+            await self._replay(websocket, protocol, last_seq)
+
+        reader = asyncio.ensure_future(self._receive_from_client(websocket, protocol))
+        pump = asyncio.ensure_future(self._pump_to_client(websocket, protocol))
+        self._client_tasks = (reader, pump)
+        try:
+            done, _ = await asyncio.wait([reader, pump], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            reader.cancel()
+            pump.cancel()
+            await asyncio.gather(reader, pump, return_exceptions=True)
+
+        if self.websocket is not websocket:
+            return "replaced"
+        self.websocket = None
+        self._client_tasks = ()
+        if self._hangup:
+            return "hangup"
+        if pump in done and not pump.cancelled() and pump.exception() is None:
+            return "upstream_done"
+        return "client_gone"
+
+    def detach(self):
+        """Keep the upstream alive for the grace period, then give up."""
+        print(f"[AI Voice] Session {self.metrics.id} detached, resumable for {VOICE_RESUME_GRACE:.0f}s.")
+        self._detached = True
+        for kind, payload in self.down_queue.drain():
+            self._remember(kind, payload)
+        loop = asyncio.get_running_loop()
+        self._expiry = loop.call_later(VOICE_RESUME_GRACE, lambda: asyncio.ensure_future(self.close()))
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.ended = True
+        if self._expiry is not None:
+            self._expiry.cancel()
+        for task in self._upstream:
+            task.cancel()
+        await asyncio.gather(*self._upstream, return_exceptions=True)
+        await _close_session(self.stack)
+        self._slots.release()
+        _schedule_refill()
+
+        _resumable.pop(self.token, None)
+        metrics = self.metrics
+        _active_sessions.pop(metrics.id, None)
+        _totals["sessions"] += 1
+        _totals["dropped"] += metrics.upstream.dropped + metrics.downstream.dropped
+        _totals["merged"] += metrics.upstream.merged + metrics.downstream.merged
+        summary = metrics.as_dict()
+        print(f"[AI Voice] Session Closed. up={summary['upstream']} down={summary['downstream']}")
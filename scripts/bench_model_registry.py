@@ -0,0 +1,69 @@
+"""
+Micro-benchmark: per-request model setup cost, before and after the registry.
+
+"before" constructs genai.GenerativeModel(...) for every call, as ai_brain
+used to do on each attempt. "after" fetches the cached instance from
+ai_brain.model_registry. With --network, it also times a count_tokens
+round-trip on a fresh model against a warmed one.
+
+Usage:
+    python scripts/bench_model_registry.py --iterations 20000
+    python scripts/bench_model_registry.py --network
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import google.generativeai as genai
+
+import ai_brain
+
+
+def _time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(args):
+    model_id = ai_brain.MODEL_IDS[0]
+
+    before = _time_per_call(
+        lambda: genai.GenerativeModel(
+            model_id,
+            safety_settings=ai_brain.SAFETY_SETTINGS,
+            generation_config=ai_brain.JSON_OUTPUT,
+        ),
+        args.iterations,
+    )
+    ai_brain.warm_up()
+    after = _time_per_call(lambda: ai_brain._model(model_id, ai_brain.JSON_OUTPUT), args.iterations)
+
+    print(f"[Bench] Model setup per request: before={before:.1f}us after={after:.2f}us "
+          f"({before / after:.0f}x less overhead)")
+
+    if args.network:
+        cold = genai.GenerativeModel(model_id, safety_settings=ai_brain.SAFETY_SETTINGS)
+        start = time.perf_counter()
+        cold.count_tokens("ping")
+        first = (time.perf_counter() - start) * 1000
+
+        warm = ai_brain._model(model_id)
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            warm.count_tokens("ping")
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"[Bench] count_tokens round-trip: first={first:.0f}ms "
+              f"reused={min(samples):.0f}-{max(samples):.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GenerativeModel reuse micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--network", action="store_true", help="also time real upstream calls")
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark: vision_engine.detect_ui_elements, before and after vectorizing.
+
+"before" is the previous implementation (resize to 100x100, then Python
+loops over getdata() and a Counter of pixel tuples). "after" is
+vision_engine.ui_features, which reads every pixel of the full-resolution
+frame and also computes edge and text-block density. Image decoding is
+timed separately since both pay it.
+
+Usage:
+    python scripts/bench_ui_detection.py                      # synthetic 1920x1080 screen
+    python scripts/bench_ui_detection.py --image shot.png --iterations 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import vision_engine
+
+
+def legacy_ui_features(img):
+    """The previous detect_ui_elements body, after the image is opened."""
+    width, height = img.size
+    pixels = img.resize((100, 100)).getdata()
+    dominant_colors = Counter(pixels).most_common(5)
+    white_pixels = sum(1 for p in pixels if sum(p) > 700)
+    dark_pixels = sum(1 for p in pixels if sum(p) < 100)
+    return {
+        "size": f"{width}x{height}",
+        "is_document": white_pixels > 5000,
+        "is_dark_theme": dark_pixels > 5000,
+        "dominant_colors": len(dominant_colors),
+    }
+
+
+def synthetic_screen(path, width=1920, height=1080):
+    """Dark editor with lines of 'text', a light side panel and a title bar."""
+    rng = np.random.default_rng(0)
+    img = Image.new("RGB", (width, height), (30, 30, 30))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, width, 32), fill=(60, 60, 60))
+    draw.rectangle((width - 420, 32, width, height), fill=(245, 245, 245))
+    for y in range(60, height - 20, 22):
+        x = 40
+        while x < width - 500:
+            word = int(rng.integers(3, 12)) * 8
+            draw.text((x, y), "x" * (word // 8), fill=(200, 200, 120))
+            x += word + 8
+    img.save(path)
+
+
+def _time_per_call(fn, arg, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main(args):
+    path = args.image
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), "bench_ui_screen.png")
+        synthetic_screen(path)
+
+    full = Image.open(path).convert("RGB")
+    decode = _time_per_call(lambda p: np.asarray(Image.open(p).convert("RGB")), path, args.iterations)
+    print(f"[Bench] PNG decode {decode:.1f}ms (paid by both, excluded below)")
+
+    # Full frame, and the 512px frame analyze_screen() captures by default
+    small = full.copy()
+    small.thumbnail((512, 512), Image.LANCZOS)
+    for img in (full, small):
+        rgb = np.asarray(img)
+        before = _time_per_call(legacy_ui_features, img, args.iterations)
+        after = _time_per_call(vision_engine.ui_features, rgb, args.iterations)
+        print(f"[Bench] {img.size[0]}x{img.size[1]}:")
+        print(f"    before (100x100 resample, Python loops): {before:.2f}ms  {legacy_ui_features(img)}")
+        print(f"    after  (full frame, NumPy):              {after:.2f}ms  {vision_engine.ui_features(rgb)}")
+        print(f"    {before / after:.1f}x faster, {img.size[0] * img.size[1] / 10000:.0f}x more pixels analyzed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="detect_ui_elements micro-benchmark")
+    parser.add_argument("--image", help="screenshot to analyze (default: synthetic 1920x1080)")
+    parser.add_argument("--iterations", type=int, default=20)
+    main(parser.parse_args())
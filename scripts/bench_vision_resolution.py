@@ -0,0 +1,155 @@
+"""
+Benchmark: OCR accuracy vs latency at different capture resolutions.
+
+Settings compared (each on the same screen):
+  legacy-512     downscale to 512px with LANCZOS, full-frame OCR (the old capture)
+  overview-1024  downscale to 1024px with the budget-picked filter, full-frame OCR
+  native-full    native resolution, full-frame OCR
+  native-blocks  native resolution, OCR of the detected text blocks only
+                 (vision_engine.ocr_text_blocks, what analyze_screen uses)
+
+Accuracy is word recall against the ground truth: the words drawn on the
+synthetic screen, or with --image the native-full OCR of that image.
+Resize filter timings (and the filter each budget picks) and text block
+detection (and whether native-blocks reads blocks or falls back to one
+full-frame pass) are printed as well; they do not need Tesseract.
+
+Synthetic screens:
+  document   body text plus a small-print side panel (few large blocks)
+  dashboard  a grid of short, scattered labels (many small blocks)
+
+Usage:
+    python scripts/bench_vision_resolution.py                   # synthetic 1920x1080 document
+    python scripts/bench_vision_resolution.py --screen dashboard
+    python scripts/bench_vision_resolution.py --image shot.png --iterations 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import vision_engine
+
+WORDS = ("patient dose tablet morning evening refill pharmacy stock order insulin "
+         "allergy warning label batch expiry schedule nurse ward daily weekly").split()
+
+
+def synthetic_screen(size=(1920, 1080), seed=0):
+    """Window-like screen with body text, a small-print side panel and an image block."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", size, (245, 245, 245))
+    draw = ImageDraw.Draw(img)
+    truth = []
+    draw.rectangle((0, 0, size[0], 28), fill=(40, 40, 48))
+    for y in range(80, 640, 16):
+        line = " ".join(rng.choice(WORDS) for _ in range(12))
+        draw.text((80, y), line, fill=(20, 20, 20))
+        truth.extend(line.split())
+    for y in range(120, 420, 13):
+        line = " ".join(rng.choice(WORDS) for _ in range(4))
+        draw.text((1460, y), line, fill=(90, 90, 90))
+        truth.extend(line.split())
+    draw.rectangle((900, 700, 1300, 1000), fill=(30, 110, 190))
+    return img, truth
+
+
+def dashboard_screen(size=(1920, 1080), seed=0):
+    """Grid of widgets, each a short label and value far from its neighbours."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", size, (245, 245, 245))
+    draw = ImageDraw.Draw(img)
+    truth = []
+    draw.rectangle((0, 0, size[0], 28), fill=(40, 40, 48))
+    for y in range(90, size[1] - 120, 150):
+        for x in range(60, size[0] - 200, 300):
+            line = " ".join(rng.choice(WORDS) for _ in range(2))
+            draw.text((x, y), line, fill=(20, 20, 20))
+            draw.text((x, y + 16), str(rng.randint(1, 999)), fill=(60, 60, 60))
+            truth.extend(line.split())
+    return img, truth
+
+
+SCREENS = {"document": synthetic_screen, "dashboard": dashboard_screen}
+
+
+def recall(words, truth) -> float:
+    found, expected = Counter(w.lower().strip(".,:;") for w in words), Counter(truth)
+    hit = sum(min(found[w], n) for w, n in expected.items())
+    return hit / max(1, sum(expected.values()))
+
+
+def run_ocr(setting, img):
+    if setting == "legacy-512":
+        ratio = 512 / max(img.size)
+        small = img.resize((int(img.size[0] * ratio), int(img.size[1] * ratio)), Image.LANCZOS)
+        return vision_engine.ocr_frame(vision_engine.Frame(small))
+    if setting == "overview-1024":
+        return vision_engine.ocr_frame(vision_engine.Frame(vision_engine.downscale_image(img, 1024)))
+    if setting == "native-full":
+        return vision_engine.ocr_frame(vision_engine.Frame(img))
+    return vision_engine.ocr_text_blocks(vision_engine.Frame(img))
+
+
+def bench_resize(img, iterations):
+    ratio = 512 / max(img.size)
+    size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
+    print(f"[Bench] Downscale {img.size[0]}x{img.size[1]} -> {size[0]}x{size[1]}:")
+    for name, resample in vision_engine.RESIZE_FILTERS:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            img.resize(size, resample)
+        print(f"  {name:<8} {(time.perf_counter() - start) / iterations * 1000:7.1f}ms")
+    for budget in (2, 5, 15, 50):
+        picked = vision_engine.pick_resize_filter(img.size, budget)
+        name = next(n for n, r in vision_engine.RESIZE_FILTERS if r == picked)
+        print(f"  budget {budget:>3}ms picks {name}")
+
+
+def main(args):
+    if args.image:
+        img, truth = Image.open(args.image).convert("RGB"), None
+    else:
+        img, truth = SCREENS[args.screen]()
+
+    bench_resize(img, args.iterations)
+
+    frame = vision_engine.Frame(img)
+    start = time.perf_counter()
+    blocks = vision_engine.text_blocks(frame)
+    covered = sum((b["box"][2] - b["box"][0]) * (b["box"][3] - b["box"][1]) for b in blocks)
+    print(f"[Bench] Text blocks: {len(blocks)} covering {covered / (img.size[0] * img.size[1]):.0%} "
+          f"of the frame, found in {(time.perf_counter() - start) * 1000:.1f}ms")
+    path = "full-frame pass" if vision_engine._ocr_blocks(frame) is None else f"{len(blocks)} block passes"
+    print(f"[Bench] native-blocks reads: {path} (OCR_MAX_BLOCKS={vision_engine.OCR_MAX_BLOCKS})")
+
+    if vision_engine._lazy_import_ocr() is None:
+        print("[Bench] pytesseract not installed, skipping the OCR comparison")
+        return
+
+    if truth is None:
+        truth = [w["text"].lower() for w in run_ocr("native-full", img).words]
+        print(f"[Bench] Ground truth: native-full OCR ({len(truth)} words)")
+
+    print(f"[Bench] {'setting':<14} {'latency':>9} {'recall':>7}")
+    for setting in ("legacy-512", "overview-1024", "native-full", "native-blocks"):
+        samples = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            result = run_ocr(setting, img)
+            samples.append(time.perf_counter() - start)
+        words = [w["text"] for w in result.words] if result else []
+        print(f"[Bench] {setting:<14} {min(samples) * 1000:7.0f}ms {recall(words, truth):7.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR resolution accuracy/latency benchmark")
+    parser.add_argument("--image", help="screenshot to use instead of the synthetic screen")
+    parser.add_argument("--screen", choices=sorted(SCREENS), default="document", help="synthetic screen layout")
+    parser.add_argument("--iterations", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,103 @@
+"""
+Load test: pharmacy scan latency under concurrent AI load.
+
+Measures p50/p99 of GET /api/pharmacy/scan/{token} twice - once with the
+server idle and once while a batch of /api/analyze_report requests is in
+flight. With the AI calls dispatched off the event loop the two p99 values
+should stay within a few milliseconds of each other.
+
+Usage:
+    python scripts/load_test_pharmacy.py --base http://127.0.0.1:8001 --report public/patient_portal_hero.png
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _create_prescription(client):
+    payload = {
+        "doctor_id": "load-test-doctor",
+        "hospital_id": "load-test-hospital",
+        "patient_id": "load-test-patient",
+        "patient_name": "Load Test",
+        "medications": [{"name": "Paracetamol", "dose": "500mg"}],
+        "diagnosis_context": "load test",
+        "insurance_data": {"status": "active", "copay": 0.0},
+    }
+    resp = await client.post("/api/generate_prescription", json=payload)
+    resp.raise_for_status()
+    return resp.json()["token"]
+
+
+async def _scan_loop(client, token, total, concurrency):
+    """Fire `total` scans with at most `concurrency` outstanding; return latencies in ms."""
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            start = time.perf_counter()
+            resp = await client.get(f"/api/pharmacy/scan/{token}")
+            latencies.append((time.perf_counter() - start) * 1000)
+            resp.raise_for_status()
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+async def _report_load(client, report_bytes, count):
+    async def one():
+        files = {"file": ("report.png", report_bytes, "image/png")}
+        try:
+            await client.post("/api/analyze_report", files=files, timeout=300)
+        except httpx.HTTPError as e:
+            print(f"[LoadTest] Report request failed: {e}")
+
+    await asyncio.gather(*(one() for _ in range(count)))
+
+
+def _summary(label, latencies):
+    print(f"[LoadTest] {label}: n={len(latencies)} "
+          f"p50={statistics.median(latencies):.1f}ms "
+          f"p99={_percentile(latencies, 99):.1f}ms "
+          f"max={max(latencies):.1f}ms")
+
+
+async def main(args):
+    with open(args.report, "rb") as f:
+        report_bytes = f.read()
+
+    async with httpx.AsyncClient(base_url=args.base, timeout=30) as client:
+        token = await _create_prescription(client)
+        print(f"[LoadTest] Prescription token: {token}")
+
+        idle = await _scan_loop(client, token, args.scans, args.concurrency)
+        _summary("Idle scans", idle)
+
+        ai_task = asyncio.create_task(_report_load(client, report_bytes, args.reports))
+        await asyncio.sleep(0.5)  # let the report requests reach the AI workers
+        loaded = await _scan_loop(client, token, args.scans, args.concurrency)
+        _summary(f"Scans with {args.reports} reports in flight", loaded)
+        await ai_task
+
+    drift = _percentile(loaded, 99) - _percentile(idle, 99)
+    print(f"[LoadTest] p99 drift under AI load: {drift:+.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pharmacy scan latency under AI load")
+    parser.add_argument("--base", default="http://127.0.0.1:8001")
+    parser.add_argument("--report", default="public/patient_portal_hero.png")
+    parser.add_argument("--reports", type=int, default=12, help="concurrent report analyses")
+    parser.add_argument("--scans", type=int, default=500, help="scan requests per phase")
+    parser.add_argument("--concurrency", type=int, default=20, help="outstanding scan requests")
+    asyncio.run(main(parser.parse_args()))
@@ -1,16 +1,33 @@
 """Speech Recognition Engine - Faster-Whisper Integration (INT8 Optimized)"""
+import bisect
 import os
+import threading
 from pathlib import Path
 
+import numpy as np
+
 try:
-    from faster_whisper import WhisperModel
+    from faster_whisper import WhisperModel, decode_audio
     WHISPER_AVAILABLE = True
 except ImportError:
     WHISPER_AVAILABLE = False
     print("[Speech] faster-whisper not installed. pip install faster-whisper")
 
-# Shared model
+# Shared model (built once; dictation calls in from ai_dispatch worker threads)
 _model = None
+_batched = None
+_model_lock = threading.Lock()
+
+# Streaming input: 16 kHz mono signed 16-bit little-endian PCM (same as the ai_voice socket)
+SAMPLE_RATE = 16000
+
+# Latency/accuracy presets for StreamingTranscriber
+STREAM_MODES = {
+    # Partials every 0.5s with greedy decoding; finals also greedy
+    "greedy": {"beam_size": 1, "partial_interval": 0.5, "final_beam_size": 1},
+    # Partials every second, greedy; finals re-decoded with beam search
+    "beam": {"beam_size": 1, "partial_interval": 1.0, "final_beam_size": 5},
+}
 
 def get_model():
     """Get or load Faster-Whisper model (High Acc, Low RAM with INT8)"""
@@ -18,13 +35,30 @@ def get_model():
     if _model is not None:
         return _model
     
-    if WHISPER_AVAILABLE:
-        print("[Speech] Loading Faster-Whisper (distil-large-v3, compute=int8)...")
-        # distil-large-v3 is ~750MB in INT8, fits perfectly in 8GB systems
-        _model = WhisperModel("distil-large-v3", device="cpu", compute_type="int8")
-        print("[Speech] Model loaded!")
+    with _model_lock:
+        if _model is None and WHISPER_AVAILABLE:
+            print("[Speech] Loading Faster-Whisper (distil-large-v3, compute=int8)...")
+            # distil-large-v3 is ~750MB in INT8, fits perfectly in 8GB systems
+            _model = WhisperModel("distil-large-v3", device="cpu", compute_type="int8")
+            print("[Speech] Model loaded!")
     return _model
 
+def get_batched_pipeline():
+    """
+    Batched decoder over the shared model (faster-whisper >= 1.1).
+    Returns None on older versions; callers fall back to one clip at a time.
+    """
+    global _batched
+    if _batched is None and get_model() is not None:
+        try:
+            from faster_whisper import BatchedInferencePipeline
+        except ImportError:
+            return None
+        with _model_lock:
+            if _batched is None:
+                _batched = BatchedInferencePipeline(model=_model)
+    return _batched
+
 def listen_for_command(timeout=8):
     """Placeholder: Transcription is now handled via SpeechEngine.transcribe_audio"""
     print("[Speech] listen_for_command is deprecated. Use SpeechEngine class.")
@@ -47,10 +81,74 @@ class SpeechEngine:
     def is_available(self):
         return WHISPER_AVAILABLE and self.model is not None
     
-    def transcribe_audio(self, audio_data: str):
+    def transcribe_batch(self, audio_files: list, batch_size: int = 8, language: str = None) -> list:
+        """
+        Transcribe many clips (paths or binary file-like objects) in one pass.
+        Clips are laid out back to back and cut into <=30s windows; the
+        windows of all clips go through the encoder/decoder `batch_size` at
+        a time. Returns one text (or None) per input, in input order.
+        """
+        if not self.is_available():
+            return [None] * len(audio_files)
+        pipeline = get_batched_pipeline()
+        if pipeline is None:
+            return [self.transcribe_audio(f) for f in audio_files]
+
+        audios = []
+        for f in audio_files:
+            try:
+                audios.append(decode_audio(f, sampling_rate=SAMPLE_RATE))
+            except Exception as e:
+                print(f"[Speech] Could not decode {f}: {e}")
+                audios.append(np.zeros(0, dtype=np.float32))
+
+        window = 30 * SAMPLE_RATE
+        clips, starts, position = [], [], 0
+        for audio in audios:
+            starts.append(position / SAMPLE_RATE)
+            for offset in range(0, len(audio), window):
+                end = min(offset + window, len(audio))
+                clips.append({"start": (position + offset) / SAMPLE_RATE, "end": (position + end) / SAMPLE_RATE})
+            position += len(audio)
+        if not clips:
+            return [None] * len(audio_files)
+
+        texts = [[] for _ in audio_files]
+        try:
+            segments, _ = pipeline.transcribe(
+                np.concatenate(audios),
+                clip_timestamps=clips,
+                vad_filter=False,
+                batch_size=batch_size,
+                language=language,
+                without_timestamps=True,
+            )
+            for seg in segments:
+                # Segment times are on the joined timeline; map back to the owning clip
+                owner = bisect.bisect_right(starts, (seg.start + seg.end) / 2) - 1
+                texts[owner].append(seg.text)
+        except Exception as e:
+            print(f"[Speech] Batch transcription error: {e}")
+            for f in audio_files:
+                if hasattr(f, "seek"):
+                    f.seek(0)
+            return [self.transcribe_audio(f) for f in audio_files]
+
+        return [" ".join(parts).strip() or None for parts in texts]
+
+    def stream(self, mode: str = "greedy", **options):
+        """Start a StreamingTranscriber on this engine's model."""
+        if self.model is None:
+            self.model = get_model()
+        return StreamingTranscriber(self.model, mode=mode, **options)
+
+    def transcribe_audio(self, audio_data, raise_errors: bool = False):
         """
-        Transcribe audio file path.
+        Transcribe an audio file path or binary file-like object
+        (e.g. io.BytesIO of an upload - no temp file needed).
         Whisper handles noise and clarity natively.
+        With raise_errors, a decode/model error is raised instead of
+        being reported as None (which also means "no speech").
         """
         if not self.is_available():
             return None
@@ -64,9 +162,138 @@ class SpeechEngine:
             return text if text else None
         except Exception as e:
             print(f"[Speech] Transcription error: {e}")
+            if raise_errors:
+                raise
             return None
 
+class StreamingTranscriber:
+    """
+    Incremental dictation on top of the shared Whisper model.
+
+    Feed raw PCM chunks with `feed()`; it returns the segments that became
+    available, as dicts:
+        {"type": "partial", "text": ...}  - current utterance so far (may still change)
+        {"type": "final", "text": ...}    - utterance closed by a pause, will not change
+
+    An energy VAD gates decoding: silence is never sent to Whisper, an
+    utterance is re-decoded at most every `partial_interval` seconds of new
+    speech, and it is finalized after `endpoint_silence` seconds of quiet
+    (or `max_utterance` seconds of speech). The previous final text is used
+    as the prompt for the next utterance to keep terminology consistent.
+
+    `feed()` is blocking (it decodes). Async code splits it: `push()` does
+    the cheap VAD/buffering on the event loop and returns decode jobs, and
+    only `run(job)` - the Whisper decode - goes to a worker thread. Jobs of
+    one transcriber must be run in order.
+    """
+
+    FRAME = 480  # 30 ms VAD frames
+
+    def __init__(self, model=None, mode: str = "greedy", language: str = None,
+                 energy_threshold: float = 0.01, endpoint_silence: float = 0.6,
+                 max_utterance: float = 25.0):
+        if mode not in STREAM_MODES:
+            raise ValueError(f"Unknown stream mode {mode!r} (expected one of {sorted(STREAM_MODES)})")
+        self.model = model or get_model()
+        self.mode = mode
+        self.settings = STREAM_MODES[mode]
+        self.language = language
+        self.energy_threshold = energy_threshold
+        self.endpoint_frames = int(endpoint_silence * SAMPLE_RATE / self.FRAME)
+        self.max_samples = int(max_utterance * SAMPLE_RATE)
+        self._partial_samples = int(self.settings["partial_interval"] * SAMPLE_RATE)
+
+        self._pending = b""            # bytes not yet forming a whole VAD frame
+        self._utterance = []           # float32 frames of the open utterance
+        self._samples = 0
+        self._decoded_at = 0           # utterance length at the last partial
+        self._silent_frames = 0
+        self._last_partial = ""
+        self._prompt = None
+        # Metrics
+        self.audio_seconds = 0.0
+        self.decodes = 0
+
+    def _decode(self, audio: np.ndarray, beam_size: int) -> str:
+        segments, _ = self.model.transcribe(
+            audio,
+            beam_size=beam_size,
+            language=self.language,
+            initial_prompt=self._prompt,
+            condition_on_previous_text=False,
+            without_timestamps=True,
+        )
+        self.decodes += 1
+        return " ".join(seg.text for seg in segments).strip()
+
+    def _job(self, kind: str, beam_size: int) -> dict:
+        return {"type": kind, "audio": np.concatenate(self._utterance), "beam_size": beam_size}
+
+    def _finalize(self) -> list:
+        jobs = []
+        if self._utterance:
+            jobs.append(self._job("final", self.settings["final_beam_size"]))
+        self._utterance = []
+        self._samples = 0
+        self._decoded_at = 0
+        self._silent_frames = 0
+        self._last_partial = ""
+        return jobs
+
+    def run(self, job: dict) -> list:
+        """Decode one job from push(); returns the partial/final events it produced (blocking)."""
+        text = self._decode(job["audio"], job["beam_size"])
+        if job["type"] == "final":
+            if not text:
+                return []
+            self._prompt = text
+            return [{"type": "final", "text": text}]
+        if text and text != self._last_partial:
+            self._last_partial = text
+            return [{"type": "partial", "text": text}]
+        return []
+
+    def feed(self, pcm: bytes) -> list:
+        """Add a chunk of 16 kHz mono int16 PCM; return new partial/final segments."""
+        return [event for job in self.push(pcm) for event in self.run(job)]
+
+    def push(self, pcm: bytes) -> list:
+        """Add a chunk of 16 kHz mono int16 PCM (VAD and buffering only); return decode jobs."""
+        data = self._pending + pcm
+        usable = len(data) - len(data) % (self.FRAME * 2)
+        self._pending = data[usable:]
+        if not usable:
+            return []
+
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        self.audio_seconds += len(samples) / SAMPLE_RATE
+        frames = samples.reshape(-1, self.FRAME)
+        voiced = np.sqrt(np.mean(frames * frames, axis=1)) >= self.energy_threshold
+
+        jobs = []
+        for frame, is_voiced in zip(frames, voiced):
+            if not self._utterance and not is_voiced:
+                continue  # leading silence never reaches the decoder
+            self._utterance.append(frame)
+            self._samples += self.FRAME
+            self._silent_frames = 0 if is_voiced else self._silent_frames + 1
+            if self._silent_frames >= self.endpoint_frames or self._samples >= self.max_samples:
+                jobs.extend(self._finalize())
+
+        if self._utterance and self._silent_frames == 0 and self._samples - self._decoded_at >= self._partial_samples:
+            jobs.append(self._job("partial", self.settings["beam_size"]))
+            self._decoded_at = self._samples
+        return jobs
+
+    def flush(self) -> list:
+        """Finalize whatever is buffered (end of stream); returns decode jobs like push()."""
+        self._pending = b""
+        return self._finalize()
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "audio_seconds": round(self.audio_seconds, 2), "decodes": self.decodes}
+
 def reset():
     pass
 
-__all__ = ["listen_for_command", "smart_correction", "SpeechEngine", "get_model", "WHISPER_AVAILABLE"]
+__all__ = ["listen_for_command", "smart_correction", "SpeechEngine", "StreamingTranscriber", "get_model", "get_batched_pipeline", "WHISPER_AVAILABLE"]
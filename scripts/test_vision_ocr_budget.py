@@ -0,0 +1,47 @@
+"""
+OCR budget check for vision_engine.analyze_screen: a slow text block must
+give partial OCR text marked "incomplete", not the empty stage default.
+
+Tesseract is replaced by a stand-in that takes SLOW_BLOCK seconds per
+call, so this runs without Tesseract installed:
+    python scripts/test_vision_ocr_budget.py
+"""
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+SLOW_BLOCK = 0.6
+
+
+def fake_image_to_data(image, output_type=None, timeout=0):
+    if timeout and timeout < SLOW_BLOCK:
+        time.sleep(timeout)
+        raise RuntimeError("Tesseract process timeout")  # what pytesseract raises
+    time.sleep(SLOW_BLOCK)
+    return {"text": ["insulin"], "left": [2], "top": [2], "width": [40], "height": [10],
+            "conf": [90], "block_num": [1], "par_num": [1], "line_num": [1]}
+
+
+fake = types.ModuleType("pytesseract")
+fake.Output = types.SimpleNamespace(DICT="dict")
+fake.image_to_data = fake_image_to_data
+fake.get_tesseract_version = lambda: "stand-in"
+sys.modules["pytesseract"] = fake
+
+import vision_engine
+from bench_vision_resolution import synthetic_screen
+
+screen, _ = synthetic_screen()
+vision_engine.capture_frame = lambda region="full", downscale=0: vision_engine.Frame(screen)
+# Two text blocks at SLOW_BLOCK each: only the first fits the OCR budget
+vision_engine.OCR_TIMEOUT = SLOW_BLOCK * 1.5
+
+result = vision_engine.analyze_screen(use_vl=False, use_cache=False)
+print(f"OCR text: {result['ocr_text']!r}, mode: {result['cache']['ocr']}, timings: {result['timings']}")
+assert result["cache"]["ocr"] == "incomplete", result["cache"]
+assert "insulin" in result["ocr_text"], result["ocr_text"]
+print("OK: a slow block gives partial text marked incomplete")
@@ -0,0 +1,82 @@
+"""
+Transcribe every voice note in a directory with the local Whisper model
+and report throughput, for sizing the transcription hardware.
+
+Clips are decoded together with SpeechEngine.transcribe_batch; with
+--compare the same clips are also run one by one through
+transcribe_audio. Throughput is audio-seconds per wall-second (higher is
+better; 10x means an hour of notes takes six minutes).
+
+Usage:
+    python scripts/transcribe_dir.py voice_notes/ --batch-size 8
+    python scripts/transcribe_dir.py voice_notes/ --compare --output notes.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import speech_engine
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".ogg", ".webm", ".flac", ".aac"}
+
+
+def _audio_seconds(paths):
+    return sum(
+        len(speech_engine.decode_audio(str(p), sampling_rate=speech_engine.SAMPLE_RATE))
+        for p in paths
+    ) / speech_engine.SAMPLE_RATE
+
+
+def _report(label, audio_seconds, wall_seconds, clips):
+    print(f"[Transcribe] {label}: {clips} clips, {audio_seconds:.1f}s audio in {wall_seconds:.1f}s "
+          f"-> {audio_seconds / wall_seconds:.1f}x realtime")
+
+
+def main(args):
+    paths = sorted(p for p in Path(args.directory).iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS)
+    if not paths:
+        print(f"[Transcribe] No audio files in {args.directory}")
+        return
+
+    engine = speech_engine.SpeechEngine()
+    if not engine.is_available():
+        print("[Transcribe] faster-whisper not available")
+        return
+    audio_seconds = _audio_seconds(paths)
+
+    start = time.perf_counter()
+    texts = engine.transcribe_batch([str(p) for p in paths], batch_size=args.batch_size, language=args.language)
+    batched = time.perf_counter() - start
+    _report(f"batched (batch_size={args.batch_size})", audio_seconds, batched, len(paths))
+
+    if args.compare:
+        start = time.perf_counter()
+        for p in paths:
+            engine.transcribe_audio(str(p))
+        sequential = time.perf_counter() - start
+        _report("one by one", audio_seconds, sequential, len(paths))
+        print(f"[Transcribe] Batching speed-up: {sequential / batched:.2f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for p, text in zip(paths, texts):
+                f.write(json.dumps({"file": p.name, "text": text}) + "\n")
+        print(f"[Transcribe] Wrote {args.output}")
+    else:
+        for p, text in zip(paths, texts):
+            print(f"{p.name}: {text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-transcribe a directory of voice notes")
+    parser.add_argument("directory")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--language", default=None, help="skip language detection, e.g. 'en'")
+    parser.add_argument("--compare", action="store_true", help="also time sequential transcription")
+    parser.add_argument("--output", help="write results as JSON lines")
+    main(parser.parse_args())
@@ -1,16 +1,27 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
+import asyncio
 import ai_brain
+import ai_dispatch
+import chat_batcher
 import ai_voice
+import frontend_proxy
+import prescription_store
+import speech_engine
+import transcription_pool
 import os
 import json
+import base64
 import httpx
 import config
 import uuid
+import contextlib
 from contextlib import asynccontextmanager
+from result_cache import ResultCache
 
 # --- Data Models ---
 class ChatRequest(BaseModel):
@@ -22,8 +33,27 @@ class ChatRequest(BaseModel):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("[Server] Medical AI Logic Server Starting...")
+    try:
+        await asyncio.to_thread(ai_brain.warm_up, config.AI_WARMUP_NETWORK)
+    except Exception as e:
+        print(f"[Server] AI warm-up skipped: {e}")
+    if config.TRANSCRIBE_BACKEND in ("whisper", "auto"):
+        await whisper_pool.start()
+    ai_voice.start()
+    sweeper = asyncio.create_task(
+        prescription_store.expiry_sweeper(prescriptions, config.PRESCRIPTION_SWEEP_INTERVAL)
+    )
     yield
     print("[Server] Server Shutting Down...")
+    sweeper.cancel()
+    # A sweep in flight must finish before the store below is closed
+    with contextlib.suppress(asyncio.CancelledError):
+        await sweeper
+    await http_client.aclose()
+    ai_dispatch.shutdown()
+    whisper_pool.shutdown()
+    await ai_voice.shutdown()
+    prescriptions.close()
 
 # --- App Setup ---
 app = FastAPI(title="MediLink AI Backend", lifespan=lifespan)
@@ -35,6 +65,27 @@ http_client = httpx.AsyncClient(
     limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
 )
 
+# Stored Supabase files are re-analyzed from the same file_url; keep recent downloads
+download_cache = ResultCache(
+    "downloads",
+    max_entries=config.DOWNLOAD_CACHE_ENTRIES,
+    ttl=config.DOWNLOAD_CACHE_TTL,
+    max_memory_bytes=config.DOWNLOAD_CACHE_MB * 1024 * 1024,
+)
+
+# Opt-in coalescing of concurrent /api/chat requests into fewer Gemini calls
+chat_batches = chat_batcher.ChatBatcher(
+    window_ms=config.CHAT_BATCH_WINDOW_MS,
+    max_batch=config.CHAT_BATCH_MAX,
+) if config.CHAT_BATCH_ENABLED else None
+
+# Local faster-whisper workers (started in lifespan when TRANSCRIBE_BACKEND allows it)
+whisper_pool = transcription_pool.TranscriptionPool(
+    workers=config.WHISPER_WORKERS,
+    max_queue=config.WHISPER_MAX_QUEUE,
+    timeout=config.WHISPER_TIMEOUT,
+)
+
 ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://localhost:5174",
@@ -64,19 +115,31 @@ async def add_tunnel_bypass_header(request: Request, call_next):
 
 @app.get("/")
 @app.head("/")
-async def health_check():
+async def health_check(request: Request):
     # If not an API request, proxy to Vite (Development Mode)
     try:
-        resp = await http_client.get("/")
-        from fastapi.responses import HTMLResponse
-        return HTMLResponse(content=resp.text, status_code=resp.status_code)
+        return await frontend_proxy.forward(http_client, request, "/")
     except Exception:
         return {"status": "online", "mode": "hybrid", "frontend": "offline_or_starting"}
 
 @app.get("/api/health")
 async def api_health():
     """Explicit JSON health check for Clinical Hub"""
-    return {"status": "online", "mode": "hybrid", "timestamp": datetime.utcnow().isoformat()}
+    return {
+        "status": "online",
+        "mode": "hybrid",
+        "timestamp": datetime.utcnow().isoformat(),
+        "ai_lanes": ai_dispatch.stats(),
+        "ai_models": ai_brain.fallback_engine.stats(),
+        "model_registry": ai_brain.model_registry.stats(),
+        "cache": {
+            "analysis": ai_brain.result_cache.stats(),
+            "downloads": download_cache.stats(),
+        },
+        "chat_batching": chat_batches.stats() if chat_batches else None,
+        "whisper_pool": whisper_pool.stats(),
+        "voice_sessions": ai_voice.stats(),
+    }
 
 @app.post("/api/chat")
 async def chat_endpoint(req: ChatRequest):
@@ -84,11 +147,84 @@ async def chat_endpoint(req: ChatRequest):
     Text consultation.
     """
     try:
-        response = ai_brain.process_command(req.message, req.history, req.use_online)
+        if chat_batches:
+            response = await chat_batches.submit(req.message, req.history)
+        else:
+            response = await ai_dispatch.run("chat", ai_brain.process_command, req.message, req.history, req.use_online)
         return response
+    except ai_dispatch.DispatchBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _stream_chat(message: str, history: list):
+    """
+    Shared by the SSE and WebSocket chat streams. Yields ("delta", text)
+    while the "response" field streams in, then ("final", dict) with the
+    fully parsed reply, or ("error", message).
+    """
+    parser = ai_brain.ResponseStreamParser()
+    try:
+        async for chunk in ai_dispatch.stream("chat", ai_brain.stream_command, message, history):
+            delta = parser.feed(chunk)
+            if delta:
+                yield "delta", delta
+        yield "final", parser.finish()
+    except Exception as e:
+        print(f"[Server] Chat stream error: {str(e)}")
+        yield "error", str(e)
+
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest):
+    """
+    Text consultation streamed as Server-Sent Events:
+    `delta` events carry response text as it arrives, `final` carries the
+    complete JSON (markers, urgency, ...), `error` replaces `final` on failure.
+    """
+    async def events():
+        async for kind, payload in _stream_chat(req.message, req.history):
+            data = {"text": payload} if kind == "delta" else payload if kind == "final" else {"message": payload}
+            yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/ws/chat")
+async def websocket_chat(websocket: WebSocket):
+    """
+    Streaming text consultation over a WebSocket.
+    Client sends {"message": str, "history": [...]} per turn; server replies
+    with {"type": "delta", "text"} frames then {"type": "final", "data"}
+    (or {"type": "error", "message"}). A malformed turn gets an error frame
+    and the socket stays open for the next one.
+    """
+    await websocket.accept()
+    try:
+        async for text in websocket.iter_text():
+            try:
+                request = json.loads(text)
+            except ValueError:
+                request = None
+            if not isinstance(request, dict) or not isinstance(request.get("message", ""), str) \
+                    or not isinstance(request.get("history", []), list):
+                await websocket.send_json({
+                    "type": "error",
+                    "message": 'Expected {"message": str, "history": list}',
+                })
+                continue
+            async for kind, payload in _stream_chat(request.get("message", ""), request.get("history", [])):
+                if kind == "delta":
+                    await websocket.send_json({"type": "delta", "text": payload})
+                elif kind == "final":
+                    await websocket.send_json({"type": "final", "data": payload})
+                else:
+                    await websocket.send_json({"type": "error", "message": payload})
+    except WebSocketDisconnect:
+        pass
+
 @app.post("/api/analyze_image")
 async def analyze_image_endpoint(
     file: UploadFile = File(...), 
@@ -100,8 +236,10 @@ async def analyze_image_endpoint(
     """
     try:
         contents = await file.read()
-        response = ai_brain.analyze_image(contents, prompt, use_online)
+        response = await ai_dispatch.run("image", ai_brain.analyze_image, contents, prompt, use_online)
         return response
+    except ai_dispatch.DispatchBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -124,16 +262,21 @@ async def analyze_clinical_endpoint(
         if file:
             image_bytes = await file.read()
         elif file_url:
-            print(f"[Server] Downloading clinical file from URL: {file_url}")
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(file_url)
-                if resp.status_code == 200:
-                    image_bytes = resp.content
-                else:
-                    print(f"[Server] Failed to download file from URL: {resp.status_code}")
-
-        response = ai_brain.analyze_clinical_request(request_text, history, image_bytes)
+            image_bytes = download_cache.get(file_url)
+            if image_bytes is None:
+                print(f"[Server] Downloading clinical file from URL: {file_url}")
+                async with httpx.AsyncClient() as client:
+                    resp = await client.get(file_url)
+                    if resp.status_code == 200:
+                        image_bytes = resp.content
+                        download_cache.set(file_url, image_bytes)
+                    else:
+                        print(f"[Server] Failed to download file from URL: {resp.status_code}")
+
+        response = await ai_dispatch.run("clinical", ai_brain.analyze_clinical_request, request_text, history, image_bytes)
         return response
+    except ai_dispatch.DispatchBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -150,9 +293,12 @@ async def analyze_report_endpoint(file: UploadFile = File(...)):
         print(f"[Server] File Size: {len(contents)} bytes", flush=True)
         
         print(f"[Server] Starting AI Brain analysis...", flush=True)
-        response = ai_brain.analyze_medical_report(contents)
+        response = await ai_dispatch.run("report", ai_brain.analyze_medical_report, contents)
         print(f"[Server] AI Brain analysis complete.", flush=True)
         return response
+    except ai_dispatch.DispatchBusy as e:
+        print(f"[Server] Report lane saturated: {str(e)}", flush=True)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"[Server] !!! CRITICAL ENDPOINT ERROR: {str(e)}", flush=True)
         import traceback
@@ -168,79 +314,149 @@ async def analyze_license_endpoint(file: UploadFile = File(...)):
     print(f"[Server] Filename: {file.filename}", flush=True)
     try:
         contents = await file.read()
-        response = ai_brain.analyze_license(contents)
+        response = await ai_dispatch.run("license", ai_brain.analyze_license, contents)
         print(f"[AI Voice] AI License Analysis Result: {str(response)[:200]}...", flush=True)
         return response
+    except ai_dispatch.DispatchBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"[Server] !!! CRITICAL LICENSE ERROR: {str(e)}", flush=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _read_upload_limited(file: UploadFile, max_bytes: int) -> bytes:
+    """Read an upload into memory, rejecting it with 413 once it exceeds max_bytes."""
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(64 * 1024)
+        if not chunk:
+            return bytes(buffer)
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Audio upload exceeds {max_bytes // (1024 * 1024)} MB limit")
+
+async def _transcribe_local(contents: bytes) -> dict:
+    try:
+        text = await whisper_pool.transcribe(contents)
+    except transcription_pool.PoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        print(f"[Server] Whisper Transcription Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    print(f"[Server] Whisper Transcription: {text}")
+    return {"text": text, "backend": "whisper"}
+
 @app.post("/api/voice_to_text")
-async def voice_to_text_endpoint(file: UploadFile = File(...)):
+async def voice_to_text_endpoint(file: UploadFile = File(...), backend: str = Form(None)):
     """
-    Transcribes audio to text using Gemini's Multimodal capabilities.
-    (Pivoted from Groq to avoid needing multiple API keys).
+    Transcribes audio to text using Gemini's Multimodal capabilities,
+    or the local faster-whisper pool (`backend` form field or
+    TRANSCRIBE_BACKEND: gemini | whisper | auto).
+    The clip stays in memory end to end; the container type is sniffed
+    from its header rather than assumed to be webm.
     """
-    if not config.GEMINI_API_KEY:
+    backend = (backend or config.TRANSCRIBE_BACKEND).lower()
+    if backend != "gemini" and not whisper_pool.available:
+        if backend == "whisper":
+            raise HTTPException(status_code=503, detail="Local transcription backend is not running")
+        backend = "gemini"
+    if backend != "whisper" and not config.GEMINI_API_KEY:
         raise HTTPException(status_code=500, detail="Gemini API Key not configured")
 
-    try:
-        # Save temporary file
-        ext = file.filename.split('.')[-1] if '.' in file.filename else 'wav'
-        temp_filename = f"temp_voice_{uuid.uuid4()}.{ext}"
-        
-        contents = await file.read()
-        with open(temp_filename, "wb") as f:
-            f.write(contents)
+    contents = await _read_upload_limited(file, config.VOICE_MAX_UPLOAD_BYTES)
+    if not contents:
+        raise HTTPException(status_code=400, detail="Empty audio upload")
 
-        # Transcribe with Gemini
-        import google.generativeai as genai
-        genai.configure(api_key=config.GEMINI_API_KEY)
-        
-        # Use a model that supports audio input
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        
-        # Upload to Gemini (or pass directly)
-        # Note: For small files, passing bytes directly is faster
-        audio_part = {
-            "mime_type": "audio/webm", # MediaRecorder usually outputs webm
-            "data": contents
-        }
-        
-        prompt = "Transcribe this audio exactly as heard. Do not add any commentary or prefix. Return only the transcribed text."
-        
-        response = model.generate_content([prompt, audio_part])
-        text = response.text.strip()
-        
-        # Cleanup
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
-        
+    if backend == "whisper":
+        return await _transcribe_local(contents)
+
+    try:
+        text = await ai_dispatch.run("voice", ai_brain.transcribe_audio, contents, file.content_type)
         print(f"[Server] Gemini Transcription: {text}")
-        return {"text": text}
-        
+        return {"text": text, "backend": "gemini"}
     except Exception as e:
         print(f"[Server] Gemini Transcription Error: {str(e)}")
-        if 'temp_filename' in locals() and os.path.exists(temp_filename):
-            os.remove(temp_filename)
+        if backend == "auto":
+            # Quota exhausted / lane saturated / upstream down: stay on-box
+            return await _transcribe_local(contents)
+        if isinstance(e, ai_dispatch.DispatchBusy):
+            raise HTTPException(status_code=503, detail=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.websocket("/api/ws/ai_voice")
 async def websocket_ai_voice(websocket: WebSocket):
     """
     Real-time Multimodal Live AI Voice session.
+    Offer the "medvoice.pcm.v1" subprotocol (or ?protocol=binary) for raw
+    PCM binary frames instead of base64 JSON.
     """
-    await websocket.accept()
-    print("[Server] New AI Voice WebSocket Connection Accepted.")
+    protocol, subprotocol = ai_voice.negotiate_protocol(websocket)
+    await websocket.accept(subprotocol=subprotocol)
+    print(f"[Server] New AI Voice WebSocket Connection Accepted ({protocol}).")
     try:
-        await ai_voice.manage_voice_session(websocket)
+        await ai_voice.manage_voice_session(websocket, protocol)
     except Exception as e:
         print(f"[Server] WebSocket Session Error: {e}")
     finally:
         print("[Server] AI Voice WebSocket Connection Closed.")
 
-# --- Mock Database for Prescriptions (In-Memory for Prototype) ---
-PRESCRIPTIONS_MockDB = {}
+@app.websocket("/api/ws/dictation")
+async def websocket_dictation(websocket: WebSocket, mode: str = "greedy"):
+    """
+    Live dictation with the local Whisper model.
+    Client streams 16 kHz mono int16 PCM as binary frames (or
+    {"type": "audio", "data": base64} like /api/ws/ai_voice) and sends
+    {"type": "end"} to close the stream. Server replies with
+    {"type": "partial", "text"} while the clinician is speaking and
+    {"type": "final", "text"} after each pause.
+    `mode`: "greedy" (lowest latency) or "beam" (beam-search finals).
+    """
+    await websocket.accept()
+    if not speech_engine.WHISPER_AVAILABLE or mode not in speech_engine.STREAM_MODES:
+        await websocket.send_json({"type": "error", "message": "Local dictation unavailable" if not speech_engine.WHISPER_AVAILABLE else f"Unknown mode: {mode}"})
+        await websocket.close(code=1011 if not speech_engine.WHISPER_AVAILABLE else 1008)
+        return
+
+    async def decode(jobs):
+        # Only Whisper decodes take a dictation lane slot; VAD/buffering stays on the loop
+        for job in jobs:
+            try:
+                events = await ai_dispatch.run("dictation", transcriber.run, job)
+            except ai_dispatch.DispatchBusy:
+                if job["type"] == "partial":
+                    continue  # a later partial or the final supersedes it
+                raise
+            for event in events:
+                await websocket.send_json(event)
+
+    try:
+        transcriber = await ai_dispatch.run("dictation", speech_engine.StreamingTranscriber, mode=mode)
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                pcm = message["bytes"]
+            else:
+                frame = json.loads(message.get("text") or "{}")
+                if frame.get("type") == "end":
+                    await decode(transcriber.flush())
+                    await websocket.send_json({"type": "done", **transcriber.stats()})
+                    continue
+                if frame.get("type") != "audio":
+                    continue
+                pcm = base64.b64decode(frame["data"])
+            await decode(transcriber.push(pcm))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"[Server] Dictation Error: {e}")
+        try:
+            await websocket.send_json({"type": "error", "message": str(e)})
+        except Exception:
+            pass
+
+# --- Prescription Store (SQLite/WAL by default, shared by all workers) ---
+prescriptions = prescription_store.open_store(config.PRESCRIPTION_DB_URL)
 
 # --- Data Models for Prescriptions ---
 class PrescriptionRequest(BaseModel):
@@ -257,6 +473,7 @@ class DispenseRequest(BaseModel):
     token: str
     pharmacy_id: str
     pharmacist_id: str
+    idempotency_key: str = None # Same key on a retried scan returns the original success
 
 import uuid
 from datetime import datetime, timedelta
@@ -270,15 +487,15 @@ async def generate_prescription_endpoint(req: PrescriptionRequest):
         token = str(uuid.uuid4())
         expiry = datetime.utcnow() + timedelta(hours=24)
         
-        # Store in Mock DB (Replace with Real DB insert in production)
-        PRESCRIPTIONS_MockDB[token] = {
+        # Store I/O runs on a worker thread: a locked SQLite write waits up to busy_timeout
+        await asyncio.to_thread(prescriptions.create, {
             "token": token,
             "created_at": datetime.utcnow().isoformat(),
             "expires_at": expiry.isoformat(),
             "status": "ACTIVE",
             "data": req.dict(),
             "request_id": req.request_id # Store the request_id
-        }
+        })
         
         print(f"[Server] Generated Prescription: {token} for {req.patient_name}")
         return {
@@ -298,7 +515,7 @@ async def scan_prescription_endpoint(token: str):
     # Allow passing "MED_RX:" prefix or raw token
     clean_token = token.replace("MED_RX:", "")
     
-    record = PRESCRIPTIONS_MockDB.get(clean_token)
+    record = await asyncio.to_thread(prescriptions.get, clean_token)
     
     if not record:
         raise HTTPException(status_code=404, detail="Prescription not found")
@@ -306,7 +523,8 @@ async def scan_prescription_endpoint(token: str):
     if record['status'] == 'DISPENSED':
         return {"status": "DISPENSED", "dispensed_at": record.get('dispensed_at'), "error": "Already used"}
         
-    if datetime.fromisoformat(record['expires_at']) < datetime.utcnow():
+    # ISO timestamps sort in time order; the sweeper flips the status, this covers the gap
+    if record['status'] == 'EXPIRED' or record['expires_at'] <= datetime.utcnow().isoformat():
          return {"status": "EXPIRED", "error": "Token expired"}
 
     # MASK SENSITIVE DATA
@@ -330,23 +548,26 @@ async def dispense_prescription_endpoint(req: DispenseRequest):
     Pharmacy marks as dispensed.
     """
     clean_token = req.token.replace("MED_RX:", "")
-    record = PRESCRIPTIONS_MockDB.get(clean_token)
+
+    # Compare-and-set on status: only one terminal can win an ACTIVE token
+    ok, record = await asyncio.to_thread(
+        prescriptions.dispense,
+        clean_token,
+        datetime.utcnow().isoformat(),
+        {
+            "pharmacy_id": req.pharmacy_id,
+            "pharmacist_id": req.pharmacist_id
+        },
+        idempotency_key=req.idempotency_key
+    )
     
     if not record:
         raise HTTPException(status_code=404, detail="Prescription not found")
         
-    if record['status'] != 'ACTIVE':
+    if not ok:
         raise HTTPException(status_code=400, detail=f"Cannot dispense. Status: {record['status']}")
-
-    # Update Status
-    record['status'] = 'DISPENSED'
-    record['dispensed_at'] = datetime.utcnow().isoformat()
-    record['pharmacy_info'] = {
-        "pharmacy_id": req.pharmacy_id,
-        "pharmacist_id": req.pharmacist_id
-    }
     
-    print(f"[Server] Prescription {clean_token} DISPENSED by {req.pharmacy_id}")
+    print(f"[Server] Prescription {clean_token} DISPENSED by {record['pharmacy_info']['pharmacy_id']}")
     return {"status": "success", "dispensed_at": record['dispensed_at']}
 
 @app.get("/api/patient/{patient_id}/prescriptions")
@@ -356,21 +577,19 @@ async def get_patient_prescriptions(patient_id: str):
     """
     results = []
     
-    # Inefficient linear search for Mock DB (Fine for prototype)
-    for token, record in PRESCRIPTIONS_MockDB.items():
-        if record['data']['patient_id'] == patient_id:
-             # Only show valid ones? Or all history?
-             # Let's show all for now, frontend filters active
-             results.append({
-                 "token": token,
-                 "qr_data": f"MED_RX:{token}",
-                 "status": record['status'],
-                 "request_id": record.get('request_id'),
-                 "created_at": record['created_at'],
-                 "expires_at": record['expires_at'],
-                 "doctor_id": record['data']['doctor_id'],
-                 "medications": record['data']['medications']
-             })
+    # Indexed lookup on patient_id; all history is returned, frontend filters active
+    for record in await asyncio.to_thread(prescriptions.list_by_patient, patient_id):
+        token = record['token']
+        results.append({
+            "token": token,
+            "qr_data": f"MED_RX:{token}",
+            "status": record['status'],
+            "request_id": record.get('request_id'),
+            "created_at": record['created_at'],
+            "expires_at": record['expires_at'],
+            "doctor_id": record['data']['doctor_id'],
+            "medications": record['data']['medications']
+        })
              
     return results
 
@@ -381,32 +600,20 @@ from fastapi.responses import Response
 async def proxy_frontend(request: Request, path: str):
     # Specialized catch-all to serve Vite frontend through Python
     # Includes query parameters for versioning/JS modules
+    if path.startswith("api/"):
+        raise HTTPException(status_code=404, detail="API endpoint not found")
+
     try:
-        if path.startswith("api/"):
-            raise HTTPException(status_code=404, detail="API endpoint not found")
-            
         query_string = request.url.query
         target_path = f"/{path}" if not path.startswith('/') else path
         if query_string:
             target_path += f"?{query_string}"
-            
-        # Pass through some headers but exclude host/encoding to avoid decompression/compression issues
-        headers = {k: v for k, v in request.headers.items() if k.lower() not in ['host', 'accept-encoding']}
         
         # ADDED LOGGING FOR DIAGNOSTICS
         # print(f"[Proxy] {request.method} {target_path}")
         
-        resp = await http_client.request(
-            method=request.method,
-            url=target_path,
-            headers=headers
-        )
-        
-        return Response(
-            content=resp.content, 
-            status_code=resp.status_code, 
-            media_type=resp.headers.get("content-type")
-        )
+        # Streamed pass-through (constant memory for large 3D assets)
+        return await frontend_proxy.forward(http_client, request, target_path)
     except Exception as e:
         import traceback
         print(f"[Proxy Error] Failed to reach Vite at {path}: {str(e)}")
@@ -0,0 +1,184 @@
+"""Transcription Pool - Local faster-whisper transcription for /api/voice_to_text.
+
+Runs SpeechEngine (scripts/speech_engine.py, distil-large-v3 int8) in a
+pool of worker processes. Each worker loads the model once in its
+initializer and then only receives audio bytes, so a transcription costs
+no network round-trip and keeps working when Gemini quota is exhausted.
+
+Backpressure: at most `workers + max_queue` clips are admitted at a time.
+Beyond that `transcribe()` raises PoolBusy immediately (the endpoint
+answers 503) instead of letting latency grow without bound. A clip keeps
+its slot until its worker is done with it, even if the caller timed out.
+
+If a worker cannot load the model, start() returns False and the pool
+stays unavailable (the server keeps running on the Gemini backend).
+Worker-side transcription errors are raised to the caller, not returned
+as an empty transcript.
+
+Sizing: CTranslate2 uses 4 CPU threads per model by default, so the
+default worker count is cores / 4. Each worker holds its own copy of the
+model (~750MB in int8).
+"""
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import speech_engine
+    WHISPER_AVAILABLE = speech_engine.WHISPER_AVAILABLE
+except ImportError:
+    speech_engine = None
+    WHISPER_AVAILABLE = False
+
+# Per-process engine, created by the pool initializer
+_engine = None
+
+
+class PoolBusy(Exception):
+    """Raised when the transcription queue is full."""
+
+
+def _init_worker():
+    global _engine
+    _engine = speech_engine.SpeechEngine()
+
+
+def _ping() -> bool:
+    return _engine is not None and _engine.is_available()
+
+
+def _transcribe(audio_bytes: bytes):
+    return _engine.transcribe_audio(io.BytesIO(audio_bytes), raise_errors=True)
+
+
+@contextlib.contextmanager
+def _spawn_from_here():
+    """
+    spawn re-imports the parent's __main__ in every worker. Run as
+    `python server.py` that is the server itself (app, prescription store,
+    caches); while workers start, point them at this module instead.
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+class TranscriptionPool:
+    """Process pool of preloaded SpeechEngine workers with a bounded queue."""
+
+    def __init__(self, workers: int, max_queue: int, timeout: float = 120):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._executor = None
+        self._slots = asyncio.Semaphore(self.workers + self.max_queue)
+        # Metrics
+        self.admitted = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    async def start(self):
+        """
+        Spawn the workers and wait until every one has loaded the model.
+        Returns False (pool left unavailable) if any worker failed to.
+        """
+        if not WHISPER_AVAILABLE:
+            print("[Transcription Pool] faster-whisper not installed, local backend disabled")
+            return False
+        # spawn, not fork: the server process already runs threads (uvicorn, gRPC)
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            # The workers are spawned by these submits
+            with _spawn_from_here():
+                pings = [loop.run_in_executor(executor, _ping) for _ in range(self.workers)]
+            ready = await asyncio.gather(*pings)
+        except Exception as e:
+            ready = [False]
+            print(f"[Transcription Pool] Worker start failed: {e}")
+        if not all(ready):
+            print("[Transcription Pool] Model not loaded in every worker, local backend disabled")
+            executor.shutdown(wait=False, cancel_futures=True)
+            return False
+        self._executor = executor
+        print(f"[Transcription Pool] {self.workers} worker(s) ready in {time.perf_counter() - start:.1f}s")
+        return True
+
+    @property
+    def available(self) -> bool:
+        return self._executor is not None
+
+    async def transcribe(self, audio_bytes: bytes) -> str:
+        if not self.available:
+            raise RuntimeError("Local transcription backend is not running")
+        if self._slots.locked():
+            self.rejected += 1
+            raise PoolBusy(f"Transcription queue full ({self.workers} running, {self.max_queue} queued)")
+
+        await self._slots.acquire()  # free: checked above, nothing awaited since
+        self.admitted += 1
+        self.in_flight += 1
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(_transcribe, audio_bytes)
+        except BaseException:
+            self._job_done()
+            raise
+        # The slot is freed when the worker finishes, not when the caller
+        # gives up: a timed-out clip still occupies its worker
+        future.add_done_callback(lambda _: self._job_done_threadsafe(loop))
+        try:
+            text = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        self.total_seconds += time.perf_counter() - start
+        return text or ""
+
+    def _job_done(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def _job_done_threadsafe(self, loop):
+        try:
+            loop.call_soon_threadsafe(self._job_done)
+        except RuntimeError:
+            pass  # event loop closed under us
+
+    def stats(self) -> dict:
+        return {
+            "running": self.available,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_seconds": round(self.total_seconds / self.completed, 2) if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+__all__ = ["TranscriptionPool", "PoolBusy", "WHISPER_AVAILABLE"]
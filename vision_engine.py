@@ -19,13 +19,23 @@ Usage:
     
     # Full enhanced analysis
     result = enhanced_vision("What's on my screen?")
+    
+    # Several crops/frames in one VL call
+    descriptions = vl_describe_batch([frame_a, frame_b], "What is shown here?")
 """
 
 import os
 import gc
+import io
+import itertools
 import json
+import re
+import threading
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Union
 from PIL import Image
 import numpy as np
 
@@ -35,14 +45,53 @@ pytesseract = None
 pytesseract = None
 ollama = None
 from model_manager import model_manager
+from config import OLLAMA_VISION_MODEL
 
 # Vision model config
-VL_MODEL = "qwen3-vl:4b"  # Request: Qwen3-VL:4b
+VL_MODEL = OLLAMA_VISION_MODEL  # Request: Qwen3-VL:4b
 VL_LOADED = False
+VL_OPTIONS = {
+    "temperature": 0.2,
+    "num_predict": 200
+}
+
+# analyze_screen stage timeouts (seconds); a stage that overruns is reported empty
+OCR_TIMEOUT = 20
+UI_TIMEOUT = 5
+VL_TIMEOUT = 90
+# Share of OCR_TIMEOUT left for pool queueing and text/app extraction: Tesseract
+# stops reading blocks this much earlier, so a partial OCR result still arrives
+OCR_STAGE_HEADROOM = 0.2
+
+# Adaptive resolution: OCR reads native-resolution crops of the text blocks only,
+# the VL model gets a downscaled overview plus a few native-resolution text ROIs
+VL_OVERVIEW_SIZE = 512       # max side (px) of the VL overview image
+VL_MAX_ROIS = 2              # text regions sent to the VL model next to the overview
+VL_ROI_SIZE = 768            # max side (px) of one ROI image
+TEXT_BLOCK_PAD = 6           # px of margin around a text block before it is OCR'd
+TEXT_BLOCK_MIN_TILES = 2     # smaller glyph blobs are icons or noise
+OCR_FULL_FRAME_SHARE = 0.6   # blocks covering more than this: one full-frame OCR pass instead
+OCR_MAX_BLOCKS = 12          # more blocks than this (one Tesseract process each): one full-frame pass instead
+RESIZE_BUDGET_MS = 15        # time allowed for one downscale; picks the best filter that fits
+
+# Batched VL: images per chat request, and answer tokens allowed per image
+VL_BATCH_MAX = 4
+VL_BATCH_TOKENS = 150
+
+# Worker threads for the CPU stages (Tesseract, NumPy) of analyze_screen
+_stage_pool = None
 
-# Output directory
+# Screen cache: repeated questions about an unchanged screen reuse earlier results
+CACHE_TILE = 16               # px; frames are compared tile by tile
+CACHE_PIXEL_TOL = 24          # gray-level change that marks a tile as changed
+CACHE_MAX_PARTIAL_OCR = 0.4   # changed area (share of frame) up to which only that area is re-OCR'd
+VL_REUSE_MAX_TILES = 12       # changed tiles (any frame size) up to which a cached VL answer is still used
+
+# Tags the lines of each partial OCR pass, so passes never merge their lines
+_ocr_passes = itertools.count(1)
+
+# Output directory (only used when a screenshot is explicitly saved)
 TEMP_DIR = Path("./temp_vision")
-TEMP_DIR.mkdir(exist_ok=True)
 
 
 def _lazy_import_mss():
@@ -80,38 +129,157 @@ def _lazy_import_ollama():
     return ollama
 
 
+# =============================================================================
+# IN-MEMORY FRAMES
+# =============================================================================
+
+class Frame:
+    """
+    One screenshot held in memory for a whole analysis.
+
+    `image` (PIL) and `array` (NumPy, H x W x 3 uint8) describe the same
+    pixels; for a fresh capture `array` is a zero-copy view of the mss RGB
+    buffer and `image` is unpacked from the same bytes (no PNG round-trip).
+    `encoded()` produces image bytes for the VL model once per format and
+    caches them, so nothing is decoded or written twice.
+    """
+
+    def __init__(self, image: Image.Image, array: np.ndarray = None):
+        self.image = image
+        self._array = array
+        self._encoded = {}
+        self._ocr = None  # OCRResult, filled by ocr_frame()
+        self._blocks = None  # text_blocks() result
+
+    @classmethod
+    def from_rgb_buffer(cls, buffer: bytes, size: tuple) -> "Frame":
+        """Wrap a packed RGB buffer (e.g. mss `screenshot.rgb`)."""
+        width, height = size
+        image = Image.frombuffer("RGB", size, buffer, "raw", "RGB", 0, 1)
+        array = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+        return cls(image, array)
+
+    @classmethod
+    def from_path(cls, path: str) -> "Frame":
+        return cls(Image.open(path).convert("RGB"))
+
+    @property
+    def size(self) -> tuple:
+        return self.image.size
+
+    @property
+    def array(self) -> np.ndarray:
+        if self._array is None:
+            self._array = np.asarray(self.image)
+        return self._array
+
+    def encoded(self, fmt: str = "PNG") -> bytes:
+        """Image bytes for the VL model (PNG with fast compression, or JPEG)."""
+        if fmt not in self._encoded:
+            buf = io.BytesIO()
+            if fmt == "PNG":
+                self.image.save(buf, format="PNG", compress_level=1)
+            else:
+                self.image.save(buf, format=fmt, quality=90)
+            self._encoded[fmt] = buf.getvalue()
+        return self._encoded[fmt]
+
+    def save(self, path: str) -> str:
+        self.image.save(path)
+        return path
+
+    def crop(self, box: tuple) -> "Frame":
+        """Sub-frame for a (left, top, right, bottom) box."""
+        return Frame(self.image.crop(box))
+
+
+ImageSource = Union[str, Frame, Image.Image]
+
+
+def _as_frame(source: ImageSource) -> Frame:
+    """Accept a Frame, a PIL image or (as before) a file path."""
+    if isinstance(source, Frame):
+        return source
+    if isinstance(source, Image.Image):
+        return Frame(source.convert("RGB"))
+    return Frame.from_path(source)
+
+
+# =============================================================================
+# RESIZING
+# =============================================================================
+
+# Resize filters, best quality first
+RESIZE_FILTERS = [
+    ("lanczos", Image.LANCZOS),
+    ("bicubic", Image.BICUBIC),
+    ("bilinear", Image.BILINEAR),
+    ("box", Image.BOX),
+    ("nearest", Image.NEAREST),
+]
+_resize_cost = {}  # filter name -> measured ms per source megapixel
+
+
+def _calibrate_resize():
+    """Time each filter once on a 512x512 sample (4x downscale, as for the VL overview)."""
+    sample = Image.fromarray(np.random.default_rng(0).integers(0, 256, (512, 512, 3), dtype=np.uint8))
+    for name, resample in RESIZE_FILTERS:
+        best = float("inf")
+        for _ in range(2):
+            start = time.perf_counter()
+            sample.resize((128, 128), resample)
+            best = min(best, time.perf_counter() - start)
+        _resize_cost[name] = best * 1000 / (512 * 512 / 1e6)
+
+
+def pick_resize_filter(size: tuple, budget_ms: float = RESIZE_BUDGET_MS):
+    """Best-quality filter expected to downscale an image of `size` within `budget_ms`."""
+    if not _resize_cost:
+        _calibrate_resize()
+    megapixels = size[0] * size[1] / 1e6
+    for name, resample in RESIZE_FILTERS:
+        if _resize_cost[name] * megapixels <= budget_ms:
+            return resample
+    return Image.NEAREST
+
+
+def downscale_image(img: Image.Image, max_side: int, budget_ms: float = RESIZE_BUDGET_MS) -> Image.Image:
+    """Shrink `img` so its longer side is at most `max_side` (unchanged if already smaller)."""
+    if not max_side or max(img.size) <= max_side:
+        return img
+    ratio = max_side / max(img.size)
+    new_size = (max(1, int(img.size[0] * ratio)), max(1, int(img.size[1] * ratio)))
+    return img.resize(new_size, pick_resize_filter(img.size, budget_ms))
+
+
 # =============================================================================
 # SCREENSHOT CAPTURE
 # =============================================================================
 
-def capture_screen(
-    output_path: str = None,
+def capture_frame(
     region: str = "full",  # "full", "active", "center"
     downscale: int = 512,  # Downscale to this size for VL
-) -> str:
+) -> Optional[Frame]:
     """
-    Capture screenshot with optional region cropping and downscaling.
+    Capture the screen into memory with optional region cropping and downscaling.
     
     Args:
-        output_path: Where to save (default: temp file)
         region: "full" (entire screen), "active" (active window), "center" (center region)
-        downscale: Max dimension for VL processing (smaller = faster)
+        downscale: Max dimension for VL processing (smaller = faster, 0 = native)
     
     Returns:
-        Path to saved screenshot
+        Frame, or None if capture is unavailable
     """
     sct_lib = _lazy_import_mss()
     if sct_lib is None:
         print("[Vision] Cannot capture: mss not available")
-        return ""
-    
-    if output_path is None:
-        output_path = str(TEMP_DIR / "screen.png")
+        return None
     
     with sct_lib.mss() as sct:
         monitor = sct.monitors[1]  # Primary monitor
         screenshot = sct.grab(monitor)
-        img = Image.frombytes("RGB", screenshot.size, screenshot.rgb)
+        frame = Frame.from_rgb_buffer(screenshot.rgb, screenshot.size)
+    img = frame.image
     
     # Region cropping
     if region == "center":
@@ -132,59 +300,221 @@ def capture_screen(
         except:
             pass  # Fall back to full screen
     
-    # Downscale for VL (smaller = faster, less RAM)
-    if downscale and max(img.size) > downscale:
-        ratio = downscale / max(img.size)
-        new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-        img = img.resize(new_size, Image.LANCZOS)
+    # Downscale for VL (smaller = faster, less RAM); filter chosen by RESIZE_BUDGET_MS
+    img = downscale_image(img, downscale)
     
-    img.save(output_path)
-    return output_path
+    # Untouched capture keeps its zero-copy array view
+    return frame if img is frame.image else Frame(img)
+
+
+def capture_screen(
+    output_path: str = None,
+    region: str = "full",  # "full", "active", "center"
+    downscale: int = 512,  # Downscale to this size for VL
+) -> str:
+    """
+    Capture screenshot to a file (see capture_frame for the in-memory version).
+    
+    Args:
+        output_path: Where to save (default: temp file)
+        region: "full" (entire screen), "active" (active window), "center" (center region)
+        downscale: Max dimension for VL processing (smaller = faster)
+    
+    Returns:
+        Path to saved screenshot
+    """
+    frame = capture_frame(region=region, downscale=downscale)
+    if frame is None:
+        return ""
+    
+    if output_path is None:
+        TEMP_DIR.mkdir(exist_ok=True)
+        output_path = str(TEMP_DIR / "screen.png")
+    return frame.save(output_path)
 
 
 # =============================================================================
 # OCR - TEXT EXTRACTION
 # =============================================================================
 
-def extract_text(image_path: str) -> str:
-    """Extract text from image using OCR"""
+class OCRResult:
+    """
+    Words, boxes and confidences from one Tesseract pass over a frame.
+    Plain text, lines and confident regions are all derived from it, so
+    extract_text / extract_text_regions / detect_windows share one pass.
+    """
+
+    def __init__(self, data: Dict = None):
+        self.complete = True  # False if the OCR budget ran out before every text block was read
+        self.words = []
+        for i, text in enumerate((data or {}).get('text', [])):
+            if not text.strip():
+                continue
+            self.words.append({
+                "text": text,
+                "x": data['left'][i],
+                "y": data['top'][i],
+                "w": data['width'][i],
+                "h": data['height'][i],
+                "conf": float(data['conf'][i]),
+                "line": (data['block_num'][i], data['par_num'][i], data['line_num'][i]),
+            })
+
+    @classmethod
+    def from_words(cls, words: List[Dict]) -> "OCRResult":
+        """Build from word dicts, ordered by line position then x."""
+        result = cls()
+        line_top = {}
+        for w in words:
+            line_top[w["line"]] = min(line_top.get(w["line"], w["y"]), w["y"])
+        result.words = sorted(words, key=lambda w: (line_top[w["line"]], w["line"], w["x"]))
+        return result
+
+    @property
+    def text(self) -> str:
+        return " ".join(w["text"] for w in self.words)
+
+    def lines(self) -> List[str]:
+        """Words joined per Tesseract line, in reading order."""
+        lines = {}
+        for w in self.words:
+            lines.setdefault(w["line"], []).append(w["text"])
+        return [" ".join(words) for words in lines.values()]
+
+    def regions(self, min_conf: float = 50) -> List[Dict]:
+        return [
+            {k: w[k] for k in ("text", "x", "y", "w", "h", "conf")}
+            for w in self.words if w["conf"] > min_conf
+        ]
+
+
+def ocr_frame(image: ImageSource, timeout: float = 0) -> Optional[OCRResult]:
+    """
+    Run OCR once per Frame; later calls on the same Frame reuse the result.
+    `timeout` (seconds, 0 = none) kills a Tesseract run that overruns.
+    """
     ocr = _lazy_import_ocr()
     if ocr is None:
-        return ""
-    
+        return None
+    frame = _as_frame(image)
+    if frame._ocr is None:
+        data = ocr.image_to_data(frame.image, output_type=ocr.Output.DICT, timeout=timeout)
+        frame._ocr = OCRResult(data)
+    return frame._ocr
+
+
+def _overlaps(word: Dict, box: tuple) -> bool:
+    x0, y0, x1, y1 = box
+    return word["x"] < x1 and word["x"] + word["w"] > x0 and word["y"] < y1 and word["y"] + word["h"] > y0
+
+
+def ocr_incremental(frame: Frame, previous: OCRResult, box: tuple, timeout: float = 0) -> OCRResult:
+    """
+    Re-OCR only `box` (x0, y0, x1, y1) of `frame`, keeping `previous` words
+    outside it. The box first grows to cover any old word it cuts through
+    (repeatedly, since a grown box can cut through further words), so
+    words at the edge are read whole.
+    """
+    grown = None
+    while grown != box:
+        grown, (x0, y0, x1, y1) = box, box
+        for w in previous.words:
+            if _overlaps(w, grown):
+                x0, y0 = min(x0, w["x"]), min(y0, w["y"])
+                x1, y1 = max(x1, w["x"] + w["w"]), max(y1, w["y"] + w["h"])
+        box = (x0, y0, x1, y1)
+    fresh = ocr_frame(Frame(frame.image.crop(box)), timeout=timeout)
+    kept = [w for w in previous.words if not _overlaps(w, box)]
+    tag = ("changed", next(_ocr_passes))
+    added = [
+        {**w, "x": w["x"] + x0, "y": w["y"] + y0, "line": tag + w["line"]}
+        for w in (fresh.words if fresh else [])
+    ]
+    return OCRResult.from_words(kept + added)
+
+
+def ocr_text_blocks(frame: Frame, timeout: float = 0) -> Optional[OCRResult]:
+    """
+    OCR at native resolution, but only inside text_blocks(frame): each
+    block is read as its own crop and its words are mapped back to frame
+    coordinates. Blank areas, images and flat UI are skipped, so small
+    text stays readable without paying for a full-resolution pass. When
+    the blocks cover most of the frame, or there are more than
+    OCR_MAX_BLOCKS of them (each is a Tesseract process of its own), one
+    full-frame pass is used instead.
+    Blocks still unread when `timeout` runs out are logged and the result
+    is marked incomplete (ScreenCache does not keep it).
+    The result is cached on the frame like ocr_frame's.
+    """
+    ocr = _lazy_import_ocr()
+    if ocr is None:
+        return None
+    if frame._ocr is not None:
+        return frame._ocr
+    blocks = _ocr_blocks(frame)
+    if blocks is None:
+        try:
+            return ocr_frame(frame, timeout=timeout)
+        except RuntimeError as e:  # pytesseract: process timeout or Tesseract error
+            print(f"[Vision] Full-frame OCR failed: {e}")
+            frame._ocr = OCRResult()
+            frame._ocr.complete = False
+            return frame._ocr
+
+    start = time.perf_counter()
+    words = []
+    read = 0
+    for i, block in enumerate(blocks):
+        remaining = timeout - (time.perf_counter() - start) if timeout else 0
+        if timeout and remaining <= 0:
+            break
+        x0, y0 = block["box"][:2]
+        try:
+            data = ocr.image_to_data(frame.image.crop(block["box"]), output_type=ocr.Output.DICT, timeout=remaining)
+        except RuntimeError as e:  # pytesseract: process timeout or Tesseract error
+            print(f"[Vision] OCR of text block {i + 1} failed: {e}")
+            break
+        words.extend(
+            {**w, "x": w["x"] + x0, "y": w["y"] + y0, "line": (i,) + w["line"]}
+            for w in OCRResult(data).words
+        )
+        read += 1
+    frame._ocr = OCRResult.from_words(words)
+    if read < len(blocks):
+        frame._ocr.complete = False
+        print(f"[Vision] OCR budget spent: {len(blocks) - read} of {len(blocks)} text blocks left unread")
+    return frame._ocr
+
+
+def _ocr_blocks(frame: Frame) -> Optional[List[Dict]]:
+    """The text blocks ocr_text_blocks reads one by one, or None for one full-frame pass."""
+    blocks = text_blocks(frame)
+    width, height = frame.size
+    covered = sum((b["box"][2] - b["box"][0]) * (b["box"][3] - b["box"][1]) for b in blocks)
+    if covered > OCR_FULL_FRAME_SHARE * width * height or len(blocks) > OCR_MAX_BLOCKS:
+        return None
+    return blocks
+
+
+def extract_text(image: ImageSource) -> str:
+    """Extract text from image (Frame, PIL image or path) using OCR"""
     try:
-        img = Image.open(image_path)
-        text = ocr.image_to_string(img)
-        # Clean up
-        text = " ".join(text.split())  # Remove extra whitespace
-        return text[:1000]  # Limit length
+        result = ocr_frame(image)
+        if result is None:
+            return ""
+        return result.text[:1000]  # Limit length
     except Exception as e:
         print(f"[Vision] OCR error: {e}")
         return ""
 
 
-def extract_text_regions(image_path: str) -> List[Dict]:
+def extract_text_regions(image: ImageSource) -> List[Dict]:
     """Extract text with bounding boxes"""
-    ocr = _lazy_import_ocr()
-    if ocr is None:
-        return []
-    
     try:
-        img = Image.open(image_path)
-        data = ocr.image_to_data(img, output_type=ocr.Output.DICT)
-        
-        regions = []
-        for i, text in enumerate(data['text']):
-            if text.strip() and data['conf'][i] > 50:  # Confidence > 50%
-                regions.append({
-                    "text": text,
-                    "x": data['left'][i],
-                    "y": data['top'][i],
-                    "w": data['width'][i],
-                    "h": data['height'][i],
-                    "conf": data['conf'][i]
-                })
-        return regions
+        result = ocr_frame(image)
+        if result is None:
+            return []
+        return result.regions(min_conf=50)  # Confidence > 50%
     except Exception as e:
         print(f"[Vision] OCR regions error: {e}")
         return []
@@ -194,47 +524,166 @@ def extract_text_regions(image_path: str) -> List[Dict]:
 # PYTHON HELPERS - STRUCTURE DETECTION
 # =============================================================================
 
-def detect_ui_elements(image_path: str) -> Dict:
+# detect_ui_elements thresholds
+WHITE_SUM = 700    # R+G+B above this counts as white (document/text area)
+DARK_SUM = 100     # R+G+B below this counts as dark (code editor/terminal)
+EDGE_STEP = 40     # gray-level jump between neighbours that counts as an edge
+TEXT_TILE = 16     # tile size (px) for text-block density
+TEXT_TILE_EDGES = (0.08, 0.45)  # edge share of a tile that looks like glyphs, not flat UI or photo noise
+
+
+def _edge_map(gray: np.ndarray) -> np.ndarray:
+    """Gray-level jump to the right or below neighbour (|a-b| without leaving uint8)."""
+    right, below = gray[:-1, 1:], gray[1:, :-1]
+    here = gray[:-1, :-1]
+    return ((np.maximum(here, right) - np.minimum(here, right)) > EDGE_STEP) | \
+           ((np.maximum(here, below) - np.minimum(here, below)) > EDGE_STEP)
+
+
+def _text_tiles(edges: np.ndarray) -> np.ndarray:
+    """TEXT_TILE grid of tiles whose share of edge pixels looks like glyphs."""
+    rows, cols = edges.shape[0] // TEXT_TILE, edges.shape[1] // TEXT_TILE
+    if not rows or not cols:
+        return np.zeros((rows, cols), dtype=bool)
+    tiles = edges[:rows * TEXT_TILE, :cols * TEXT_TILE].reshape(rows, TEXT_TILE, cols, TEXT_TILE)
+    tile_edges = tiles.sum(axis=(1, 3), dtype=np.uint16) / (TEXT_TILE * TEXT_TILE)
+    low, high = TEXT_TILE_EDGES
+    return (tile_edges > low) & (tile_edges < high)
+
+
+def ui_features(rgb: np.ndarray) -> Dict:
+    """
+    Cheap layout features of a full-resolution RGB frame (H x W x 3, uint8),
+    vectorized: white/dark ratios, dominant colors (15-bit color histogram),
+    edge density and the share of tiles that look like text.
+    """
+    height, width = rgb.shape[:2]
+    total = height * width
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+    channel_sum = r.astype(np.uint16) + g + b
+    white_ratio = np.count_nonzero(channel_sum > WHITE_SUM) / total
+    dark_ratio = np.count_nonzero(channel_sum < DARK_SUM) / total
+
+    # Dominant colors: 5 bits per channel packed into one 32768-bin histogram.
+    # Every 2nd pixel each way is plenty for a palette (UI colors come in large flat areas)
+    rs, gs, bs = r[::2, ::2], g[::2, ::2], b[::2, ::2]
+    packed = ((rs >> 3).astype(np.uint16) << 10) | ((gs >> 3).astype(np.uint16) << 5) | (bs >> 3)
+    counts = np.bincount(packed.ravel(), minlength=1 << 15)
+    top = np.argpartition(counts, -5)[-5:]
+    top = top[np.argsort(counts[top])[::-1]]
+    top = top[counts[top] > 0]
+    palette = [
+        "#%02x%02x%02x" % (((c >> 10) & 31) * 8 + 4, ((c >> 5) & 31) * 8 + 4, (c & 31) * 8 + 4)
+        for c in top.tolist()
+    ]
+
+    edges = _edge_map((channel_sum // 3).astype(np.uint8))
+    edge_density = np.count_nonzero(edges) / edges.size if edges.size else 0.0
+    text_tiles = _text_tiles(edges)
+    text_density = np.count_nonzero(text_tiles) / text_tiles.size if text_tiles.size else 0.0
+
+    return {
+        "size": f"{width}x{height}",
+        "is_document": bool(white_ratio > 0.5),
+        "is_dark_theme": bool(dark_ratio > 0.5),
+        "dominant_colors": len(palette),
+        "palette": palette,
+        "white_ratio": round(float(white_ratio), 3),
+        "dark_ratio": round(float(dark_ratio), 3),
+        "edge_density": round(float(edge_density), 3),
+        "text_density": round(float(text_density), 3),
+    }
+
+
+def detect_ui_elements(image: ImageSource) -> Dict:
     """
     Detect UI elements using image analysis (no ML needed).
-    Uses color detection, edge detection, etc.
+    Uses color, brightness and edge statistics (see ui_features).
     """
     try:
-        img = Image.open(image_path)
-        img_array = np.array(img)
-        
-        # Basic analysis
-        width, height = img.size
-        
-        # Detect dominant colors (potential UI elements)
-        from collections import Counter
-        pixels = img.resize((100, 100)).getdata()
-        color_counts = Counter(pixels)
-        dominant_colors = color_counts.most_common(5)
-        
-        # Detect if there's a lot of white (document/text area)
-        white_pixels = sum(1 for p in pixels if sum(p) > 700)
-        is_document = white_pixels > 5000
-        
-        # Detect if there's a lot of dark (code editor/terminal)
-        dark_pixels = sum(1 for p in pixels if sum(p) < 100)
-        is_dark_theme = dark_pixels > 5000
-        
-        return {
-            "size": f"{width}x{height}",
-            "is_document": is_document,
-            "is_dark_theme": is_dark_theme,
-            "dominant_colors": len(dominant_colors),
-        }
+        return ui_features(_as_frame(image).array)
     except Exception as e:
         print(f"[Vision] UI detection error: {e}")
         return {}
 
 
-def detect_windows(image_path: str) -> List[str]:
+def text_blocks(image: ImageSource) -> List[Dict]:
+    """
+    Text blocks of a frame from its layout alone (no OCR): glyph-like
+    tiles (see ui_features), bridged one tile each way so words and lines
+    join up, grouped into connected blocks.
+    
+    Returns [{"box": (x0, y0, x1, y1), "tiles": glyph tiles}] in reading
+    order, in pixels of the frame. Cached on the frame.
+    """
+    frame = _as_frame(image)
+    if frame._blocks is not None:
+        return frame._blocks
+    rgb = frame.array
+    gray = ((rgb[..., 0].astype(np.uint16) + rgb[..., 1] + rgb[..., 2]) // 3).astype(np.uint8)
+    mask = _text_tiles(_edge_map(gray))
+
+    grown = mask.copy()
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    bridged = grown.copy()
+    bridged[1:] |= grown[:-1]
+    bridged[:-1] |= grown[1:]
+
+    width, height = frame.size
+    rows, cols = bridged.shape
+    seen = np.zeros_like(bridged)
+    blocks = []
+    for r0, c0 in zip(*np.nonzero(bridged)):
+        if seen[r0, c0]:
+            continue
+        seen[r0, c0] = True
+        stack = [(r0, c0)]
+        top, left, bottom, right, glyphs = r0, c0, r0, c0, 0
+        while stack:
+            r, c = stack.pop()
+            glyphs += mask[r, c]
+            top, bottom, left, right = min(top, r), max(bottom, r), min(left, c), max(right, c)
+            for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if 0 <= nr < rows and 0 <= nc < cols and bridged[nr, nc] and not seen[nr, nc]:
+                    seen[nr, nc] = True
+                    stack.append((nr, nc))
+        if glyphs < TEXT_BLOCK_MIN_TILES:
+            continue
+        blocks.append({
+            "box": (
+                max(0, int(left) * TEXT_TILE - TEXT_BLOCK_PAD),
+                max(0, int(top) * TEXT_TILE - TEXT_BLOCK_PAD),
+                min(width, (int(right) + 1) * TEXT_TILE + TEXT_BLOCK_PAD),
+                min(height, (int(bottom) + 1) * TEXT_TILE + TEXT_BLOCK_PAD),
+            ),
+            "tiles": int(glyphs),
+        })
+    blocks.sort(key=lambda b: (b["box"][1], b["box"][0]))
+    frame._blocks = blocks
+    return blocks
+
+
+def text_rois(frame: Frame, count: int = VL_MAX_ROIS, max_side: int = VL_ROI_SIZE) -> List[Frame]:
+    """
+    The `count` densest text blocks as native-resolution crops (each at
+    most `max_side`), to show the VL model text the overview blurs.
+    Blocks covering half the frame or more add nothing over the overview.
+    """
+    width, height = frame.size
+    blocks = [
+        b for b in text_blocks(frame)
+        if (b["box"][2] - b["box"][0]) * (b["box"][3] - b["box"][1]) < width * height / 2
+    ]
+    blocks = sorted(blocks, key=lambda b: b["tiles"], reverse=True)[:count]
+    return [Frame(downscale_image(frame.image.crop(b["box"]), max_side)) for b in blocks]
+
+
+def detect_windows(image: ImageSource) -> List[str]:
     """Detect open windows from taskbar/title bars"""
-    # This uses OCR to find window titles
-    text = extract_text(image_path)
+    # This uses OCR to find window titles (shares the frame's OCR pass)
+    text = extract_text(image)
     
     # Common app names to look for
     apps = ["Chrome", "Firefox", "Edge", "VSCode", "Visual Studio", "Notepad", 
@@ -254,35 +703,44 @@ def detect_windows(image_path: str) -> List[str]:
 # SMALL VL MODEL - ROUGH SCENE UNDERSTANDING
 # =============================================================================
 
-def vl_describe(image_path: str, prompt: str = "Describe what you see") -> str:
+def _roi_prompt(prompt: str, rois: int) -> str:
+    if not rois:
+        return prompt
+    return (
+        f"{prompt}\n\nThe first image is the whole screen, downscaled. The other {rois} "
+        f"are full-resolution close-ups of its main text areas; read small text there."
+    )
+
+
+def vl_describe(image: ImageSource, prompt: str = "Describe what you see", rois: List[ImageSource] = None) -> str:
     """
     Use small VL model for rough scene understanding.
-    Loads on-demand, unloads after use.
+    Loads on demand; model_manager keeps it warm between queries and
+    holds it only for the duration of the request.
+    The image is sent as in-memory bytes (encoded once per Frame).
+    `rois` are optional high-resolution crops sent along with the image
+    (see text_rois).
     """
     global VL_LOADED
     _lazy_import_ollama()
     
-    # Ensure Vision Model is loaded via Manager
-    model_manager.switch_to_vision()
-    
-    print(f"[Vision] VL analyzing: {prompt[:50]}...")
-    import time
     start_time = time.time()
-    
     try:
-        print(f"[Vision] ⏱️ Sending request to Ollama... (T+0s)")
-        resp = ollama.chat(
-            model=VL_MODEL,
-            messages=[{
-                "role": "user",
-                "content": prompt,
-                "images": [image_path]
-            }],
-            options={
-                "temperature": 0.2,
-                "num_predict": 200
-            }
-        )
+        # Vision model resident (and unevictable) for this request only
+        with model_manager.hold(VL_MODEL):
+            print(f"[Vision] VL analyzing: {prompt[:50]}...")
+            start_time = time.time()
+            print(f"[Vision] ⏱️ Sending request to Ollama... (T+0s)")
+            resp = ollama.chat(
+                model=VL_MODEL,
+                messages=[{
+                    "role": "user",
+                    "content": _roi_prompt(prompt, len(rois or [])),
+                    "images": [_as_frame(i).encoded() for i in [image] + list(rois or [])]
+                }],
+                options=VL_OPTIONS,
+                keep_alive=-1  # residency is model_manager's call
+            )
         duration = time.time() - start_time
         print(f"[Vision] ✅ Inference complete in {duration:.1f}s")
         
@@ -293,67 +751,470 @@ def vl_describe(image_path: str, prompt: str = "Describe what you see") -> str:
         return ""
 
 
+async def vl_describe_async(image: ImageSource, prompt: str = "Describe what you see", rois: List[ImageSource] = None) -> str:
+    """
+    vl_describe for the event loop: the blocking model load and image
+    encoding run on worker threads, the request itself is an async
+    Ollama call so OCR/UI stages keep running meanwhile.
+    """
+    global VL_LOADED
+    _lazy_import_ollama()
+    loop = asyncio.get_running_loop()
+    frames = [_as_frame(i) for i in [image] + list(rois or [])]
+    
+    start_time = time.time()
+    try:
+        # Vision model resident (and unevictable) for this request only
+        async with model_manager.hold_async(VL_MODEL):
+            images = [await loop.run_in_executor(_get_stage_pool(), f.encoded) for f in frames]
+            print(f"[Vision] VL analyzing: {prompt[:50]}...")
+            start_time = time.time()
+            # Closed on exit: an unclosed client leaks its httpx connection pool
+            async with ollama.AsyncClient() as client:
+                resp = await client.chat(
+                    model=VL_MODEL,
+                    messages=[{
+                        "role": "user",
+                        "content": _roi_prompt(prompt, len(frames) - 1),
+                        "images": images
+                    }],
+                    options=VL_OPTIONS,
+                    keep_alive=-1  # residency is model_manager's call
+                )
+        print(f"[Vision] ✅ Inference complete in {time.time() - start_time:.1f}s")
+        VL_LOADED = True
+        return resp["message"]["content"].strip()
+    except Exception as e:
+        print(f"[Vision] ❌ VL error after {time.time() - start_time:.1f}s: {e}")
+        return ""
+
+
+# =============================================================================
+# BATCHED VL - SEVERAL CROPS OR FRAMES PER MODEL CALL
+# =============================================================================
+
+def _vl_request(images: List[bytes], prompt: str) -> Dict:
+    """Chat arguments for one VL call; several images share one copy of the prompt."""
+    if len(images) > 1:
+        prompt = (
+            f"{prompt}\n\n"
+            f"You are given {len(images)} images, numbered 1 to {len(images)} in the order attached. "
+            f"Answer for each image separately. Reply with only a JSON array of exactly "
+            f"{len(images)} strings, the answer for image 1 first."
+        )
+    return {
+        "model": VL_MODEL,
+        "messages": [{"role": "user", "content": prompt, "images": images}],
+        "options": {**VL_OPTIONS, "num_predict": max(VL_OPTIONS["num_predict"], VL_BATCH_TOKENS * len(images))},
+        "keep_alive": -1,  # residency is model_manager's call
+    }
+
+
+def _split_batch_reply(text: str, count: int) -> Optional[List[str]]:
+    """One answer per image from a batched reply, or None if it cannot be split."""
+    if count == 1:
+        return [text.strip()]
+    start, end = text.find("["), text.rfind("]")
+    if start != -1 and end > start:
+        try:
+            answers = json.loads(text[start:end + 1])
+        except ValueError:
+            answers = None
+        if isinstance(answers, list) and len(answers) == count:
+            return [str(a).strip() for a in answers]
+    # Small models sometimes ignore the JSON request and number their answers
+    numbered = {}
+    for line in text.splitlines():
+        m = re.match(r"\s*\**\s*(?:image\s*)?(\d+)\s*\**\s*[.:)-]\s*\**\s*(.+)", line, re.IGNORECASE)
+        if m:
+            numbered.setdefault(int(m.group(1)), m.group(2).strip())
+    if sorted(numbered) == list(range(1, count + 1)):
+        return [numbered[i] for i in range(1, count + 1)]
+    return None
+
+
+def _batch_chunks(frames: List[Frame]) -> List[List[Frame]]:
+    return [frames[i:i + VL_BATCH_MAX] for i in range(0, len(frames), VL_BATCH_MAX)]
+
+
+def _vl_chunk(client, chunk: List[Frame], prompt: str) -> List[str]:
+    start_time = time.time()
+    try:
+        resp = client.chat(**_vl_request([f.encoded() for f in chunk], prompt))
+    except Exception as e:
+        # Ollama down or timed out: single requests would only fail the same way
+        print(f"[Vision] ❌ VL batch error after {time.time() - start_time:.1f}s: {e}")
+        return [""] * len(chunk)
+    answers = _split_batch_reply(resp["message"]["content"], len(chunk))
+    if answers is not None:
+        print(f"[Vision] ✅ {len(chunk)} image(s) described in {time.time() - start_time:.1f}s")
+        return answers
+    print(f"[Vision] Batch of {len(chunk)} fell back to single requests")
+    return [answer for f in chunk for answer in _vl_chunk(client, [f], prompt)]
+
+
+async def _vl_chunk_async(client, chunk: List[Frame], prompt: str) -> List[str]:
+    loop = asyncio.get_running_loop()
+    images = [await loop.run_in_executor(_get_stage_pool(), f.encoded) for f in chunk]
+    start_time = time.time()
+    try:
+        resp = await client.chat(**_vl_request(images, prompt))
+    except Exception as e:
+        # Ollama down or timed out: single requests would only fail the same way
+        print(f"[Vision] ❌ VL batch error after {time.time() - start_time:.1f}s: {e}")
+        return [""] * len(chunk)
+    answers = _split_batch_reply(resp["message"]["content"], len(chunk))
+    if answers is not None:
+        print(f"[Vision] ✅ {len(chunk)} image(s) described in {time.time() - start_time:.1f}s")
+        return answers
+    print(f"[Vision] Batch of {len(chunk)} fell back to single requests")
+    return [answer for f in chunk for answer in await _vl_chunk_async(client, [f], prompt)]
+
+
+def vl_describe_batch(images: List[ImageSource], prompt: str = "Describe what you see") -> List[str]:
+    """
+    Describe several images (region crops, recent frames) in few VL calls.
+    
+    Up to VL_BATCH_MAX images go into one chat request with a single copy
+    of the prompt, and the reply is split back into one description per
+    image, in input order. A batch whose reply cannot be split is re-run
+    one image at a time, so batching only saves round-trips - it never
+    loses a description. A request that fails outright (Ollama down, no
+    reply within VL_TIMEOUT) is not retried: its images come back as "".
+    
+    The VL model is held for the whole batch and released afterwards.
+    """
+    frames = [_as_frame(image) for image in images]
+    if not frames:
+        return []
+    _lazy_import_ollama()
+    with model_manager.hold(VL_MODEL), ollama.Client(timeout=VL_TIMEOUT) as client:
+        print(f"[Vision] VL batch of {len(frames)}: {prompt[:50]}...")
+        return [answer for chunk in _batch_chunks(frames) for answer in _vl_chunk(client, chunk, prompt)]
+
+
+async def vl_describe_batch_async(images: List[ImageSource], prompt: str = "Describe what you see") -> List[str]:
+    """vl_describe_batch for the event loop (async Ollama client, encoding on worker threads)."""
+    frames = [_as_frame(image) for image in images]
+    if not frames:
+        return []
+    _lazy_import_ollama()
+    # One client (and connection pool) per batch, closed on exit
+    async with model_manager.hold_async(VL_MODEL), ollama.AsyncClient(timeout=VL_TIMEOUT) as client:
+        print(f"[Vision] VL batch of {len(frames)}: {prompt[:50]}...")
+        results = []
+        for chunk in _batch_chunks(frames):
+            results.extend(await _vl_chunk_async(client, chunk, prompt))
+        return results
+
+
+def describe_regions(image: ImageSource, boxes: List[tuple], prompt: str = "Describe what you see") -> List[str]:
+    """Crop each (left, top, right, bottom) box out of one frame and describe them as a batch."""
+    frame = _as_frame(image)
+    return vl_describe_batch([frame.crop(box) for box in boxes], prompt)
+
+
 def unload_vl_model():
-    """Unload VL model to free RAM (Return to Brain)"""
-    # Simply switch back to brain to maximize responsiveness
-    model_manager.switch_to_brain()
+    """Unload the VL model now (Return to Brain), unless a request still holds it"""
+    # Requests only hold it while they run; between them model_manager keeps
+    # it resident and returns to the brain once idle for MODEL_IDLE_TIMEOUT
+    model_manager.unload(VL_MODEL)
 
 
 # =============================================================================
 # ENHANCED VISION - COMBINE ALL SOURCES
 # =============================================================================
 
-def analyze_screen(
+class ScreenCache:
+    """
+    The last analyzed frame and what was learned from it.
+
+    A new frame is compared with the previous one pixel-wise, in
+    CACHE_TILE-sized tiles (~20ms for a native 1080p frame). If nothing changed,
+    OCR and any VL answer to the same question are reused; if a small area
+    changed, only that area is re-OCR'd. A VL answer is diffed against the
+    frame it was computed on, not the latest one, and kept as long as at
+    most VL_REUSE_MAX_TILES changed since (cursor blink, clock tick) - a
+    screen that drifts a little per frame does not keep an answer forever.
+
+    Thread-safe: analyze_screen runs compare/store from worker threads and
+    concurrent calls. compare() works on a snapshot taken under the lock
+    (cached arrays are replaced, never modified), so one frame's tiles are
+    never paired with another frame's VL answer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.gray = None
+        self.region = None
+        self.ocr = None
+        self.vl = {}  # question -> (description, gray of the frame it describes)
+
+    @staticmethod
+    def _gray(frame: Frame) -> np.ndarray:
+        rgb = frame.array
+        return ((rgb[..., 0].astype(np.uint16) + rgb[..., 1] + rgb[..., 2]) // 3).astype(np.uint8)
+
+    @staticmethod
+    def _changed_tiles(gray: np.ndarray, reference: np.ndarray) -> np.ndarray:
+        diff = (np.maximum(gray, reference) - np.minimum(gray, reference)) > CACHE_PIXEL_TOL
+        rows = np.arange(0, diff.shape[0], CACHE_TILE)
+        cols = np.arange(0, diff.shape[1], CACHE_TILE)
+        return np.add.reduceat(np.add.reduceat(diff, rows, axis=0, dtype=np.uint32), cols, axis=1) > 0
+
+    def compare(self, frame: Frame, region: str) -> Dict:
+        """Plan for `frame`: changed share, changed box, and what can be reused."""
+        gray = self._gray(frame)
+        plan = {"gray": gray, "changed": 1.0, "box": None, "ocr": None, "vl": {}}
+        with self._lock:
+            last, last_region, last_ocr, answers = self.gray, self.region, self.ocr, dict(self.vl)
+        if last is None or last_region != region or last.shape != gray.shape:
+            return plan
+
+        tiles = self._changed_tiles(gray, last)
+        plan["changed"] = float(tiles.mean())
+
+        if not tiles.any():
+            plan["ocr"] = last_ocr
+        elif plan["changed"] <= CACHE_MAX_PARTIAL_OCR and last_ocr is not None:
+            r = np.flatnonzero(tiles.any(axis=1))
+            c = np.flatnonzero(tiles.any(axis=0))
+            height, width = gray.shape
+            plan["box"] = (
+                int(c[0]) * CACHE_TILE, int(r[0]) * CACHE_TILE,
+                min(width, (int(c[-1]) + 1) * CACHE_TILE), min(height, (int(r[-1]) + 1) * CACHE_TILE),
+            )
+            plan["ocr"] = last_ocr
+
+        changed_since = {}  # answers computed on the same frame share its gray array
+        for question, (description, reference) in answers.items():
+            if reference.shape != gray.shape:
+                continue
+            if id(reference) not in changed_since:
+                changed_since[id(reference)] = (
+                    tiles if reference is last else self._changed_tiles(gray, reference)
+                ).sum()
+            if changed_since[id(reference)] <= VL_REUSE_MAX_TILES:
+                plan["vl"][question] = description
+        return plan
+
+    def store(self, plan: Dict, region: str, ocr: Optional[OCRResult], question: str, description: str):
+        with self._lock:
+            self.gray = plan["gray"]
+            self.region = region
+            self.ocr = ocr if ocr is not None and ocr.complete else None  # re-read what was left unread
+            # Reused answers keep the frame they were computed on
+            vl = {q: self.vl[q] for q in plan["vl"] if q in self.vl}
+            if description:
+                vl[question] = (description, plan["gray"])
+            self.vl = vl
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+
+_screen_cache = ScreenCache()
+
+
+def _get_stage_pool() -> ThreadPoolExecutor:
+    global _stage_pool
+    if _stage_pool is None:
+        _stage_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="vision")
+    return _stage_pool
+
+
+async def _timed_stage(name: str, coro, timeout: float, default, timings: Dict):
+    """Await one stage with a timeout; record its duration, fall back to `default`."""
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(coro, timeout)
+    except asyncio.TimeoutError:
+        print(f"[Vision] {name} timed out after {timeout}s")
+        return default
+    except Exception as e:
+        print(f"[Vision] {name} error: {e}")
+        return default
+    finally:
+        timings[name] = round(time.perf_counter() - start, 3)
+
+
+def _ocr_stage(frame: Frame, plan: Dict, deadline: float) -> tuple:
+    """
+    OCR for analyze_screen. Tesseract gets until `deadline` (perf_counter
+    time, set when the stage was submitted and OCR_STAGE_HEADROOM before
+    the stage timeout), so an overrun returns partial text marked
+    "incomplete" instead of being discarded by the stage timeout.
+    """
+    budget = max(0.01, deadline - time.perf_counter())  # 0 would mean no timeout
+    if plan["ocr"] is not None and plan["box"] is None:
+        frame._ocr = plan["ocr"]
+        mode = "reused"
+    elif plan["ocr"] is not None:
+        try:
+            frame._ocr = ocr_incremental(frame, plan["ocr"], plan["box"], timeout=budget)
+            mode = "partial"
+        except RuntimeError as e:
+            # Changed area unread: keep the previous words, but not in the cache
+            print(f"[Vision] Partial OCR failed: {e}")
+            frame._ocr = OCRResult.from_words(plan["ocr"].words)
+            frame._ocr.complete = False
+            mode = "incomplete"
+    else:
+        result = ocr_text_blocks(frame, timeout=budget)
+        mode = "full" if result is None or result.complete else "incomplete"
+    return extract_text(frame), detect_windows(frame), mode
+
+
+def _vl_inputs(frame: Frame) -> tuple:
+    """Downscaled overview plus native-resolution text ROIs of a native frame."""
+    overview = Frame(downscale_image(frame.image, VL_OVERVIEW_SIZE))
+    return overview, text_rois(frame) if VL_MAX_ROIS else []
+
+
+async def _vl_stage(frame: Frame, question: str) -> str:
+    # vl_describe_async holds the VL model only for the request; model_manager
+    # unloads it once idle or RAM is needed
+    overview, rois = await asyncio.get_running_loop().run_in_executor(_get_stage_pool(), _vl_inputs, frame)
+    return await vl_describe_async(overview, question, rois=rois)
+
+
+async def analyze_screen_async(
     question: str = "What's on the screen?",
     use_ocr: bool = True,
     use_vl: bool = True,
     region: str = "full",
+    save_path: str = None,
+    on_partial=None,
+    early: bool = False,
+    use_cache: bool = True,
 ) -> Dict:
     """
-    Full enhanced screen analysis.
+    Full enhanced screen analysis with the stages running concurrently.
     
-    Combines:
-    1. Screenshot capture (with optional cropping)
-    2. OCR text extraction
-    3. UI element detection
-    4. Small VL rough description
+    1. Screenshot capture (with optional cropping) - kept in memory
+    2. OCR text extraction + app detection  } Tesseract/NumPy on worker threads,
+    3. UI element detection                 } the VL request on the event loop,
+    4. Small VL rough description           } all at once
     
-    Returns structured data for Phi-3 to interpret.
+    Resolution is adaptive: the frame stays at native resolution, OCR
+    reads native crops of the detected text blocks only, and the VL model
+    gets a VL_OVERVIEW_SIZE overview plus up to VL_MAX_ROIS text close-ups.
+    
+    Latency is roughly the slowest stage instead of the sum. Each stage
+    has its own timeout (OCR_TIMEOUT, UI_TIMEOUT, VL_TIMEOUT); one that
+    overruns or fails comes back empty instead of failing the analysis.
+    
+    Early results: `on_partial(result)` is called as soon as OCR + UI are
+    in while the VL description may still be running. With `early=True`
+    the function returns at that point, with result["vl_pending"] set to
+    an asyncio.Task that resolves to the description.
+    
+    With `use_cache`, results for an unchanged (or barely changed) screen
+    are reused from the previous analysis (see ScreenCache); result["cache"]
+    says what was reused.
+    
+    Returns structured data for Phi-3 to interpret (plus per-stage "timings").
     """
     print("[Vision] Starting enhanced analysis...")
+    loop = asyncio.get_running_loop()
+    pool = _get_stage_pool()
+    timings = {}
     
-    # 1. Capture screenshot
-    img_path = capture_screen(region=region, downscale=512)
-    print(f"[Vision] Screenshot: {img_path}")
+    start = time.perf_counter()
+    frame = await loop.run_in_executor(pool, lambda: capture_frame(region=region, downscale=0))
+    if frame is None:
+        frame = Frame(Image.new("RGB", (1, 1)))
+    timings["capture"] = round(time.perf_counter() - start, 3)
+    print(f"[Vision] Screenshot: {frame.size[0]}x{frame.size[1]} (in memory)")
     
     result = {
-        "image_path": img_path,
+        "image_path": frame.save(save_path) if save_path else None,
         "ocr_text": "",
         "detected_apps": [],
         "ui_info": {},
         "vl_description": "",
+        "timings": timings,
     }
     
-    # 2. OCR - extract text
+    plan = _screen_cache.compare(frame, region) if use_cache else {"gray": None, "changed": 1.0, "box": None, "ocr": None, "vl": {}}
+    cache_info = {"changed": round(plan["changed"], 3), "ocr": None, "vl": None}
+    result["cache"] = cache_info
+    
+    vl_task = None
+    if use_vl and question in plan["vl"]:
+        result["vl_description"] = plan["vl"][question]
+        cache_info["vl"] = "reused"
+    elif use_vl:
+        print("[Vision] Running VL model...")
+        vl_task = asyncio.ensure_future(_timed_stage("vl", _vl_stage(frame, question), VL_TIMEOUT, "", timings))
+        cache_info["vl"] = "fresh"
+    
+    stages = [_timed_stage("ui", loop.run_in_executor(pool, detect_ui_elements, frame), UI_TIMEOUT, {}, timings)]
     if use_ocr:
         print("[Vision] Running OCR...")
-        result["ocr_text"] = extract_text(img_path)
-        result["detected_apps"] = detect_windows(img_path)
-        print(f"[Vision] OCR found {len(result['ocr_text'])} chars, {len(result['detected_apps'])} apps")
+        deadline = time.perf_counter() + OCR_TIMEOUT * (1 - OCR_STAGE_HEADROOM)
+        stages.append(_timed_stage("ocr", loop.run_in_executor(pool, _ocr_stage, frame, plan, deadline), OCR_TIMEOUT, ("", [], None), timings))
+    done = await asyncio.gather(*stages)
+    result["ui_info"] = done[0]
+    if use_ocr:
+        result["ocr_text"], result["detected_apps"], cache_info["ocr"] = done[1]
+        print(f"[Vision] OCR found {len(result['ocr_text'])} chars, {len(result['detected_apps'])} apps ({cache_info['ocr']})")
     
-    # 3. UI detection
-    result["ui_info"] = detect_ui_elements(img_path)
+    if on_partial is not None:
+        on_partial(dict(result))
     
-    # 4. VL description (if enabled)
-    if use_vl:
-        print("[Vision] Running VL model...")
-        result["vl_description"] = vl_describe(img_path, question)
-        # Unload VL to free RAM
-        unload_vl_model()
+    def remember(description: str):
+        if use_cache:
+            _screen_cache.store(plan, region, frame._ocr, question, description)
+    
+    if vl_task is not None:
+        if early:
+            vl_task.add_done_callback(lambda t: None if t.cancelled() else remember(t.result()))
+            result["vl_pending"] = vl_task
+            return result
+        result["vl_description"] = await vl_task
+    remember(result["vl_description"])
     
+    timings["total"] = round(time.perf_counter() - start, 3)
     return result
 
 
+def analyze_screen(
+    question: str = "What's on the screen?",
+    use_ocr: bool = True,
+    use_vl: bool = True,
+    region: str = "full",
+    save_path: str = None,
+    on_partial=None,
+    use_cache: bool = True,
+) -> Dict:
+    """
+    Full enhanced screen analysis (blocking wrapper around analyze_screen_async).
+    
+    Combines:
+    1. Screenshot capture (with optional cropping) - kept in memory
+    2. OCR text extraction
+    3. UI element detection
+    4. Small VL rough description
+    
+    Every stage reads the same in-memory Frame; nothing is written to disk
+    unless `save_path` is given.
+    Returns structured data for Phi-3 to interpret.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(analyze_screen_async(
+            question, use_ocr=use_ocr, use_vl=use_vl, region=region,
+            save_path=save_path, on_partial=on_partial, use_cache=use_cache,
+        ))
+    raise RuntimeError("analyze_screen() called from an event loop; await analyze_screen_async() instead")
+
+
 def enhanced_vision(question: str) -> Dict:
     """
     Main entry point for vision queries.
@@ -405,8 +1266,9 @@ def format_for_brain(analysis: Dict) -> str:
 # =============================================================================
 
 def cleanup():
-    """Clean up temp files and unload models"""
+    """Clean up temp files, cached results and unload models"""
     unload_vl_model()
+    _screen_cache.clear()
     
     # Remove temp screenshots
     for f in TEMP_DIR.glob("*.png"):